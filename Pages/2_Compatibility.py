@@ -0,0 +1,37 @@
+import streamlit as st
+from chart_table import chart_for
+from compatibility import compatibility
+
+# Set page configuration
+st.set_page_config(page_title="PredictMe | Compatibility", layout="centered", page_icon='🌟')
+st.title("💞 :orange[Relationship Compatibility]")
+st.write(":rainbow[Compare two Birth Charts by their Driver, Conductor and Lo Shu Grid numbers.]")
+
+# Inputs for both people are only sent on submit
+with st.form("compatibility_form"):
+    people = []
+    for col, label in zip(st.columns(2), ("First person", "Second person")):
+        col.subheader(label)
+        name = col.text_input(":blue[Full Name:]", placeholder="e.g., Mohan Kumar", key=f"{label}_name")
+        dob = col.text_input(":blue[Date of Birth (DD-MM-YYYY):]", placeholder="e.g., 25-11-1987", key=f"{label}_dob")
+        gender = col.radio("Gender:", ["Male", "Female", "NA"], index=2, key=f"{label}_gender")
+        people.append((name, dob, gender))
+    submitted = st.form_submit_button("Check Compatibility")
+
+if submitted:
+    try:
+        chart_a, chart_b = (chart_for(name, dob, gender) for name, dob, gender in people)
+    except ValueError:
+        st.error("Invalid date format. Please enter in DD-MM-YYYY format.")
+    else:
+        result = compatibility(chart_a, chart_b)
+        st.write(f"### Compatibility Score: :blue-background[{result['score']} / 100]")
+        st.progress(result["score"] / 100)
+        st.write(f"**Driver {chart_a['driver']} and {chart_b['driver']}:** {result['driver_relation']:.0%} harmony")
+        st.write(f"**Conductor {chart_a['conductor']} and {chart_b['conductor']}:** {result['conductor_relation']:.0%} harmony")
+        first, second = (name or label for (name, _, _), label in zip(people, ("First person", "Second person")))
+        if result["a_fills"]:
+            st.write(f"**{first}** brings the numbers missing from {second}'s chart: {', '.join(map(str, result['a_fills']))}")
+        if result["b_fills"]:
+            st.write(f"**{second}** brings the numbers missing from {first}'s chart: {', '.join(map(str, result['b_fills']))}")
+        st.info("For a detailed reading, contact us on [WhatsApp Chat](https://wa.me/917205467646/).")
@@ -0,0 +1,260 @@
+import base64
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from chart_table import chart_for, lookup_charts, warm_chart_table
+from numerology_batch import parse_dobs
+from validation import GENDERS
+
+# Largest request body and batch the service accepts
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_BATCH = 10000
+
+# Seconds an idle keep-alive connection may hold a handler thread
+IDLE_TIMEOUT = 10
+
+_pdf_pool = None
+
+def _validate_person(person):
+    """Return ``(full_name, dob, gender)`` from a request item, or raise ValueError."""
+    if not isinstance(person, dict):
+        raise ValueError("Each person must be a JSON object.")
+    first_name = str(person.get("first_name") or "").strip()
+    last_name = str(person.get("last_name") or "").strip()
+    dob = str(person.get("dob") or "").strip()
+    gender = person.get("gender", "NA")
+    if not first_name or not last_name:
+        raise ValueError("first_name and last_name are required.")
+    if gender not in GENDERS:
+        raise ValueError('gender must be one of "Male", "Female" or "NA".')
+    try:
+        parse_dobs([dob])
+    except ValueError:
+        raise ValueError("Invalid date format. Please enter in DD-MM-YYYY format.") from None
+    return f"{first_name} {last_name}", dob, gender
+
+def _attach_pdfs(charts):
+    """Add the base64-encoded PDF of every chart, rendering the ones not cached on the process pool."""
+    from numerology import number_interpretations
+    from reports import pdf_file_name, render_pdf_chunk
+    from render_cache import pdf_cache, pdf_cache_key, use_interpretations
+
+    use_interpretations(number_interpretations())
+    pdfs = [pdf_cache.get(pdf_cache_key(chart)) for chart in charts]
+    missing = [chart for chart, pdf_bytes in zip(charts, pdfs) if pdf_bytes is None]
+
+    chunk_size = 32
+    chunks = [
+        [
+            (pdf_file_name(chart["full_name"]), {
+                "full_name": chart["full_name"],
+                "chaldean_number": chart["name_number"],
+                "dob": chart["dob"],
+                "gender": chart["gender"],
+                "driver": chart["driver"],
+                "conductor": chart["conductor"],
+                "kuaa": chart["kuaa"],
+                "grid": chart["grid"],
+            })
+            for chart in missing[start:start + chunk_size]
+        ]
+        for start in range(0, len(missing), chunk_size)
+    ]
+    if _pdf_pool is None:
+        rendered = [item for chunk in chunks for item in render_pdf_chunk(chunk)]
+    else:
+        rendered = [item for result in _pdf_pool.map(render_pdf_chunk, chunks) for item in result]
+    for chart, (_, pdf_bytes) in zip(missing, rendered):
+        pdf_cache.put(pdf_cache_key(chart), pdf_bytes)
+    rendered = iter(pdf_bytes for _, pdf_bytes in rendered)
+    for chart, pdf_bytes in zip(charts, pdfs):
+        chart["pdf_file_name"] = pdf_file_name(chart["full_name"])
+        chart["pdf"] = base64.b64encode(pdf_bytes if pdf_bytes is not None else next(rendered)).decode("ascii")
+
+def single_chart(payload):
+    """Handle ``POST /chart``: one person in, one chart out."""
+    chart = chart_for(*_validate_person(payload))
+    if payload.get("include_pdf"):
+        _attach_pdfs([chart])
+    return chart
+
+def batch_charts(payload):
+    """
+    Handle ``POST /charts``: ``{"people": [...], "include_pdf": false}``.
+
+    Valid people are charted together through the vectorized table lookup;
+    invalid ones get an ``error`` entry at their position instead of failing
+    the whole batch.
+    """
+    people = payload.get("people")
+    if not isinstance(people, list):
+        raise ValueError('"people" must be a list.')
+    if len(people) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} people per request.")
+
+    results = [None] * len(people)
+    valid = []
+    for i, person in enumerate(people):
+        try:
+            valid.append((i, *_validate_person(person)))
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+
+    if valid:
+        _, names, dobs, genders = zip(*valid)
+        charts = lookup_charts(list(dobs), list(genders), list(names))
+        for j, (i, full_name, dob, gender) in enumerate(valid):
+            results[i] = {
+                "full_name": full_name,
+                "dob": dob,
+                "gender": gender,
+                "name_number": int(charts.name_number[j]),
+                "driver": int(charts.driver[j]),
+                "conductor": int(charts.conductor[j]),
+                "kuaa": int(charts.kuaa[j]) if gender != "NA" else None,
+                "grid": charts.grid_dict(j),
+            }
+        if payload.get("include_pdf"):
+            _attach_pdfs([results[i] for i, *_ in valid])
+    return {"charts": results}
+
+ROUTES = {
+    "/chart": single_chart,
+    "/charts": batch_charts,
+}
+
+class ChartRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PredictMeChartAPI/1.0"
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed instead of holding a thread forever
+    timeout = IDLE_TIMEOUT
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        # Give the thread back when other connections are waiting for one
+        if self.server.saturated():
+            self.close_connection = True
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "Not found."})
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        if route is None:
+            self._send_json(404, {"error": "Not found."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be delimited, so the connection cannot be reused
+            self.close_connection = True
+            self._send_json(400, {"error": "Invalid Content-Length header."})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": "Request body too large."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("The request body must be a JSON object.")
+            self._send_json(200, route(payload))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"An error occurred: {e}"})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class PooledHTTPServer(HTTPServer):
+    """
+    An HTTP server that handles connections on a bounded thread pool.
+
+    A connection keeps its thread while it is kept alive, so keep-alive is
+    dropped after the next response whenever accepted connections are queued
+    for a thread, and idle connections time out after ``IDLE_TIMEOUT``.
+    """
+
+    def __init__(self, address, handler, threads=16, quiet=False):
+        super().__init__(address, handler)
+        self.quiet = quiet
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="chart-api")
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    def saturated(self):
+        """Return True if accepted connections are waiting for a handler thread."""
+        return self._queued > 0
+
+    def process_request(self, request, client_address):
+        with self._queued_lock:
+            self._queued += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+def serve(host="127.0.0.1", port=8000, threads=16, pdf_workers=None, quiet=False):
+    """
+    Run the chart service until interrupted.
+
+    Requests are handled on ``threads`` threads; PDFs are rendered on a pool
+    of ``pdf_workers`` processes (default: CPU count; 0 renders in-thread).
+    """
+    global _pdf_pool
+    warm_chart_table()
+    if pdf_workers is None:
+        pdf_workers = os.cpu_count() or 1
+    if pdf_workers:
+        _pdf_pool = ProcessPoolExecutor(max_workers=pdf_workers)
+    server = PooledHTTPServer((host, port), ChartRequestHandler, threads=threads, quiet=quiet)
+    print(f"Serving birth charts on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown()
+            _pdf_pool = None
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service for birth chart computation.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=16, help="Request handler threads.")
+    parser.add_argument("--pdf-workers", type=int, default=None, help="PDF rendering processes (default: CPU count).")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request.")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.threads, args.pdf_workers, args.quiet)
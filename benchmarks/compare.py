@@ -0,0 +1,50 @@
+import json
+import sys
+
+# Lower is better for these; higher is better for throughput
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compare two results documents from ``benchmarks.run``.
+
+    Returns:
+        list: ``(name, size, metric, old, new, change)`` for every metric that
+        got worse by more than ``threshold`` (a fraction).
+    """
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = old.get((r["name"], r["size"]))
+        if before is None:
+            continue
+        for key in LATENCY_KEYS + ("throughput_per_sec",):
+            a, b = before[key], r[key]
+            if not a:
+                continue
+            change = (b - a) / a
+            worse = change > threshold if key in LATENCY_KEYS else change < -threshold
+            if worse:
+                regressions.append((r["name"], r["size"], key, a, b, change))
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (default 0.10).")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    print(f"{baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    for name, size, key, a, b, change in regressions:
+        print(f"REGRESSION {name} [{size}] {key}: {a:.3f} -> {b:.3f} ({change:+.0%})")
+    if not regressions:
+        print("No regressions.")
+    sys.exit(1 if regressions else 0)
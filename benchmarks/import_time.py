@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+
+# Modules a first page view should not have to import
+HEAVY_MODULES = ("pandas", "reportlab", "numpy", "control_panel")
+
+# What streamlit_app.py imports before it can render anything
+APP_MODULES = ("numerology", "reports", "chart_view", "render_cache", "chart_table", "storage", "write_queue", "validation", "tracing")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure_import_time(modules=APP_MODULES, runs=5):
+    """
+    Import ``modules`` in ``runs`` fresh interpreters (a cold start each time).
+
+    Returns:
+        dict: ``runs`` import times in ms, their ``min_ms``/``median_ms``, and
+        which ``HEAVY_MODULES`` got loaded along the way.
+    """
+    times, loaded = [], set()
+    probe = _PROBE.format(modules=tuple(modules), heavy=HEAVY_MODULES)
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result["seconds"] * 1000)
+        loaded.update(result["loaded"])
+    ordered = sorted(times)
+    return {
+        "runs_ms": times,
+        "min_ms": ordered[0],
+        "median_ms": ordered[len(ordered) // 2],
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+def import_breakdown(modules=APP_MODULES):
+    """The slowest imports (cumulative microseconds) according to ``python -X importtime``."""
+    code = "; ".join(f"import {name}" for name in modules)
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <module>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app's modules.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest imports.")
+    args = parser.parse_args()
+
+    result = measure_import_time(runs=args.runs)
+    print(f"App modules import in {result['median_ms']:.1f} ms (median of {args.runs}, min {result['min_ms']:.1f} ms)")
+    print(f"Heavy modules loaded: {', '.join(result['heavy_modules_loaded']) or 'none'}")
+    print(f"\n{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in import_breakdown()[:args.top]:
+        print(f"{cumulative_us / 1000:13.1f} {self_us / 1000:8.1f}  {name}")
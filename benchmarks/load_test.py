@@ -0,0 +1,315 @@
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from benchmarks.run import _git_commit, _percentile, _result
+from benchmarks.synthetic import FIRST_NAMES, LAST_NAMES, PLACES, ensure_database, synthetic_phone, synthetic_rows
+
+# Malformed inputs a fraction of the simulated users type, as in the real form
+INVALID_INPUTS = (
+    ("dob", "31-02-1990"),
+    ("dob", "1990-02-11"),
+    ("birth_time", "25:61:00"),
+    ("phone_number", "9876543210"),
+    ("place_of_birth", ""),
+)
+
+class Session:
+    """
+    One simulated visitor: fills in the form, submits it and downloads the PDF.
+
+    Phone numbers are new most of the time; ``duplicate_rate`` of them repeat
+    a stored user or one submitted moments ago by another session, so
+    concurrent sessions really do race on the same number.
+    """
+
+    def __init__(self, rng, seen, phone_ids, db_size, duplicate_rate, invalid_rate):
+        self.rng = rng
+        self.seen = seen  # phone numbers submitted so far in this run, shared by every session
+        self.phone_ids = phone_ids
+        self.db_size = db_size
+        self.duplicate_rate = duplicate_rate
+        self.invalid_rate = invalid_rate
+
+    def _phone(self):
+        rng = self.rng
+        if rng.random() < self.duplicate_rate:
+            if self.seen and (not self.db_size or rng.random() < 0.5):
+                return rng.choice(self.seen[-200:])
+            if self.db_size:
+                return synthetic_phone(rng.randrange(self.db_size))
+        phone = synthetic_phone(next(self.phone_ids))
+        self.seen.append(phone)
+        return phone
+
+    def form(self):
+        """The values of one submission, in ``USER_COLUMNS`` order."""
+        rng = self.rng
+        dob = date.fromordinal(rng.randint(date(1940, 1, 1).toordinal(), date(2010, 12, 31).toordinal()))
+        values = {
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "dob": dob.strftime("%d-%m-%Y"),
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            "place_of_birth": rng.choice(PLACES),
+            "phone_number": self._phone(),
+            "gender": rng.choice(("Male", "Female")),
+        }
+        if rng.random() < self.invalid_rate:
+            field, value = rng.choice(INVALID_INPUTS)
+            values[field] = value
+        return tuple(values.values())
+
+def _sync_saver(store, attempts=20):
+    """
+    ``save`` for ``--mode sync``: commit in the caller's thread.
+
+    "database is locked" errors are retried with a short backoff; the
+    retries and the time they cost are counted, since that is the lock
+    contention between sessions.
+    """
+    stats = {"retries": 0, "wait": 0.0}
+    lock = threading.Lock()
+
+    def save(*row):
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                return store.insert_user(*row)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == attempts - 1:
+                    raise
+                time.sleep(min(0.001 * 2 ** attempt, 0.1))
+                with lock:
+                    stats["retries"] += 1
+                    stats["wait"] += time.perf_counter() - started
+
+    return save, stats
+
+def run_level(sessions, per_session, save, phone_ids, seen, db_size, seed, duplicate_rate, invalid_rate, pdf_rate, think_ms):
+    """
+    Run ``sessions`` concurrent sessions of ``per_session`` submissions each.
+
+    Each submission goes through the app's pipeline: chart lookup,
+    validation, save (``save(*row)`` returns False for a known phone number)
+    and, for ``pdf_rate`` of them, the PDF download.
+
+    Returns:
+        dict: Latency samples per stage and outcome counts.
+    """
+    from chart_table import chart_for
+    from numerology import number_interpretations
+    from render_cache import cached_pdf_bytes
+    from validation import validate_user
+
+    interpretations = number_interpretations()
+    samples = {"submission": [], "chart": [], "save": [], "pdf": []}
+    counts = {"submissions": 0, "saved": 0, "duplicates": 0, "invalid": 0, "errors": 0}
+    lock = threading.Lock()
+    start = threading.Barrier(sessions)
+
+    def session(index):
+        rng = random.Random(seed * 1_000_003 + index)
+        visitor = Session(rng, seen, phone_ids, db_size, duplicate_rate, invalid_rate)
+        local = {stage: [] for stage in samples}
+        outcomes = dict.fromkeys(counts, 0)
+        start.wait()
+        for _ in range(per_session):
+            row = visitor.form()
+            t0 = time.perf_counter()
+            try:
+                try:
+                    chart = chart_for(f"{row[0]} {row[1]}", row[2], row[6])
+                except ValueError:
+                    chart = None
+                t1 = time.perf_counter()
+                local["chart"].append(t1 - t0)
+                _, reason = validate_user(*row)
+                if chart is None or reason:
+                    outcomes["invalid"] += 1
+                else:
+                    saved = save(*row)
+                    t2 = time.perf_counter()
+                    local["save"].append(t2 - t1)
+                    outcomes["saved" if saved else "duplicates"] += 1
+                    if rng.random() < pdf_rate:
+                        cached_pdf_bytes(chart, interpretations)
+                        local["pdf"].append(time.perf_counter() - t2)
+            except Exception:
+                outcomes["errors"] += 1
+            local["submission"].append(time.perf_counter() - t0)
+            outcomes["submissions"] += 1
+            if think_ms:
+                time.sleep(rng.expovariate(1000 / think_ms))
+        with lock:
+            for stage, values in local.items():
+                samples[stage].extend(values)
+            for key, value in outcomes.items():
+                counts[key] += value
+
+    threads = [threading.Thread(target=session, args=(i,), name=f"session-{i}") for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"samples": samples, **counts}
+
+def _open_store(db_dir, size, shards, seed, progress, busy_timeout=None):
+    """A fresh work copy of the synthetic ``size``-user database (split over ``shards`` files when > 1)."""
+    from storage import ShardedUserStore, UserStore, shard_paths
+
+    db_path = ensure_database(db_dir, size, seed, progress=progress)
+    work_path = os.path.join(db_dir, f"load_{size}.db")
+    paths = [work_path] if shards == 1 else shard_paths(work_path, shards)
+    for path in paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    if shards == 1:
+        with sqlite3.connect(db_path) as src, sqlite3.connect(work_path) as dst:
+            src.backup(dst)
+        return UserStore(work_path, busy_timeout=busy_timeout)
+    store = ShardedUserStore(paths, busy_timeout=busy_timeout)
+    rows = synthetic_rows(size, seed)
+    while True:
+        batch = [row[:7] for row in itertools.islice(rows, 50_000)]
+        if not batch:
+            return store
+        store.insert_users(batch)
+
+def run_load_test(levels, per_session=50, size=10_000, db_dir="bench_data", shards=1, mode="queue", seed=0,
+                  duplicate_rate=0.1, invalid_rate=0.02, pdf_rate=0.5, think_ms=0, busy_timeout=10, progress=print):
+    """
+    Load-test the submission pipeline at each concurrency level and return a results document.
+
+    Results use the ``benchmarks.run`` format (one ``load.*`` entry per
+    level, comparable with ``benchmarks.compare``), with the outcome counts,
+    lock retries and CPU use added.
+
+    The store waits at most ``busy_timeout`` milliseconds on a locked
+    database (the app waits 5 s), so lock waits surface as counted retries
+    instead of being absorbed inside SQLite.
+    """
+    from chart_table import chart_for, load_chart_table
+    from render_cache import cached_pdf_bytes, grid_cache, pdf_cache
+    from write_queue import WriteBehindQueue
+
+    # Load the chart table and ReportLab up front, so the first level does not time them
+    load_chart_table()
+    cached_pdf_bytes(chart_for("Warm Up", "01-01-1990", "Male"))
+    grid_cache.clear()
+    pdf_cache.clear()
+    store = _open_store(db_dir, size, shards, seed, progress, busy_timeout)
+    phone_ids = itertools.count(size + 10**9)
+    seen = []
+    results = []
+    for level, sessions in enumerate(levels):
+        if mode == "queue":
+            writer = WriteBehindQueue(store)
+            save = writer.submit
+        else:
+            save, sync_stats = _sync_saver(store)
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        outcome = run_level(
+            sessions, per_session, save, phone_ids, seen, size, seed * 1000 + level,
+            duplicate_rate, invalid_rate, pdf_rate, think_ms,
+        )
+        elapsed = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        if mode == "queue":
+            writer.close()
+            retries, lock_wait, dropped = writer.retries, writer.lock_wait, writer.dropped
+        else:
+            retries, lock_wait, dropped = sync_stats["retries"], sync_stats["wait"], 0
+        drain = time.perf_counter() - drain_started
+        cpu = time.process_time() - cpu_started
+
+        samples = outcome.pop("samples")
+        errors = outcome["errors"] + dropped
+        result = {
+            **_result(f"load.{mode}_{sessions}_sessions", size, samples["submission"], elapsed, outcome["submissions"], 0),
+            "sessions": sessions,
+            "shards": shards,
+            **outcome,
+            "dropped": dropped,
+            "lock_retries": retries,
+            "lock_wait_ms": lock_wait * 1000,
+            "error_rate": errors / outcome["submissions"] if outcome["submissions"] else 0.0,
+            "save_p99_ms": _percentile(samples["save"], 99),
+            "pdf_p99_ms": _percentile(samples["pdf"], 99),
+            "drain_ms": drain * 1000,
+            "cpu_percent": cpu / (elapsed + drain) * 100,
+        }
+        results.append(result)
+        progress(
+            f"{sessions:5d} sessions: {result['throughput_per_sec']:8.1f}/s"
+            f"  p99 {result['p99_ms']:8.1f} ms  retries {retries}  errors {result['error_rate']:.2%}"
+        )
+    store.close()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+            "size": size,
+            "shards": shards,
+            "mode": mode,
+            "per_session": per_session,
+            "duplicate_rate": duplicate_rate,
+            "invalid_rate": invalid_rate,
+            "pdf_rate": pdf_rate,
+            "think_ms": think_ms,
+            "busy_timeout_ms": busy_timeout,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+def print_results(document):
+    print(
+        f"{'sessions':>8} {'subs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'save p99':>9} {'pdf p99':>8}"
+        f" {'cpu %':>6} {'saved':>7} {'dup':>6} {'invalid':>7} {'retries':>7} {'lock ms':>8} {'errors':>7}"
+    )
+    for r in document["results"]:
+        print(
+            f"{r['sessions']:8d} {r['throughput_per_sec']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f}"
+            f" {r['save_p99_ms']:9.2f} {r['pdf_p99_ms']:8.2f} {r['cpu_percent']:6.0f} {r['saved']:7d} {r['duplicates']:6d}"
+            f" {r['invalid']:7d} {r['lock_retries']:7d} {r['lock_wait_ms']:8.0f} {r['error_rate']:7.2%}"
+        )
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test the submission pipeline with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Concurrency levels, run in order.")
+    parser.add_argument("--per-session", type=int, default=50, help="Submissions per session at each level.")
+    parser.add_argument("--size", type=int, default=10_000, help="Users already stored when the test starts.")
+    parser.add_argument("--db-dir", default="bench_data", help="Where synthetic databases are generated and cached.")
+    parser.add_argument("--shards", type=int, default=1, help="Store the users in this many sharded SQLite files.")
+    parser.add_argument("--mode", choices=("queue", "sync"), default="queue",
+                        help="Save through the write-behind queue (as the app does) or commit in each session.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="Share of submissions reusing a known phone number.")
+    parser.add_argument("--invalid-rate", type=float, default=0.02, help="Share of submissions with a malformed field.")
+    parser.add_argument("--pdf-rate", type=float, default=0.5, help="Share of saved submissions that download the PDF.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a session's submissions.")
+    parser.add_argument("--busy-timeout-ms", type=int, default=10,
+                        help="How long a connection waits on a locked database before the harness retries (counted).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_results.json", help="Machine-readable results file.")
+    args = parser.parse_args()
+
+    document = run_load_test(
+        args.sessions, args.per_session, args.size, args.db_dir, args.shards, args.mode, args.seed,
+        args.duplicate_rate, args.invalid_rate, args.pdf_rate, args.think_ms, args.busy_timeout_ms,
+    )
+    with open(args.out, "w") as f:
+        json.dump(document, f, indent=2)
+    print()
+    print_results(document)
+    print(f"\nResults written to {args.out}")
@@ -0,0 +1,295 @@
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.import_time import measure_import_time
+from benchmarks.synthetic import ensure_database, synthetic_phone, synthetic_rows
+
+def _percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else 0.0
+
+def measure(name, fn, size=None, iterations=200, warmup=5, items_per_call=1, memory_iterations=5):
+    """
+    Time ``fn()`` and report latency percentiles, throughput and peak memory.
+
+    Timings are taken without tracing; peak memory comes from a separate,
+    shorter run under ``tracemalloc`` so tracing overhead does not skew them.
+    """
+    for _ in range(warmup):
+        fn()
+    gc.collect()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for _ in range(memory_iterations):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _result(name, size, samples, elapsed, iterations * items_per_call, peak)
+
+def _result(name, size, samples, elapsed, items, peak_bytes):
+    return {
+        "name": name,
+        "size": size,
+        "iterations": len(samples),
+        "p50_ms": _percentile(samples, 50),
+        "p95_ms": _percentile(samples, 95),
+        "p99_ms": _percentile(samples, 99),
+        "mean_ms": float(np.mean(samples)) * 1000 if samples else 0.0,
+        "throughput_per_sec": items / elapsed if elapsed else 0.0,
+        "peak_mem_kb": peak_bytes / 1024,
+    }
+
+###############################################################################
+# Benchmarks
+###############################################################################
+def bench_calculations(rng):
+    from chart_table import load_chart_table, lookup_charts
+    from numerology import (
+        calculate_chaldean_number,
+        calculate_conductor,
+        calculate_driver,
+        calculate_kuaa,
+        generate_lo_shu_grid,
+    )
+    from numerology_batch import compute_charts
+
+    people = list(synthetic_rows(100_000, seed=rng.randint(0, 10**6)))
+    names = [f"{row[0]} {row[1]}" for row in people]
+    dobs = [row[2] for row in people]
+    genders = [row[6] for row in people]
+    cursor = iter(range(10**9))
+
+    def scalar_chart():
+        i = next(cursor) % len(people)
+        dob = dobs[i]
+        day, month, year = (int(part) for part in dob.split("-"))
+        driver = calculate_driver(day)
+        conductor = calculate_conductor(dob)
+        kuaa = calculate_kuaa(year, genders[i])
+        generate_lo_shu_grid(dob, driver, conductor, kuaa)
+        calculate_chaldean_number(names[i])
+
+    load_chart_table()
+    return [
+        measure("calc.scalar_chart", scalar_chart, iterations=20_000),
+        measure("calc.compute_charts_100k", lambda: compute_charts(dobs, genders, names), iterations=10, warmup=1, items_per_call=len(people), memory_iterations=1),
+        measure("calc.lookup_charts_100k", lambda: lookup_charts(dobs, genders, names), iterations=10, warmup=1, items_per_call=len(people), memory_iterations=1),
+    ]
+
+def bench_rendering(rng):
+    from chart_table import chart_for
+    from chart_view import grid_html
+    from numerology import number_interpretations
+    from render_cache import cached_grid_html, cached_pdf_bytes, grid_cache, pdf_cache
+    from reports import generate_pdf
+
+    people = list(synthetic_rows(1000, seed=rng.randint(0, 10**6)))
+    charts = [chart_for(f"{row[0]} {row[1]}", row[2], row[6]) for row in people]
+    cursor = iter(range(10**9))
+    interpretations = number_interpretations()
+
+    def render_grid():
+        grid_html(charts[next(cursor) % len(charts)]["grid"])
+
+    def render_pdf():
+        chart = charts[next(cursor) % len(charts)]
+        generate_pdf(
+            chart["full_name"], chart["name_number"], chart["dob"], chart["gender"],
+            chart["driver"], chart["conductor"], chart["kuaa"], chart["grid"], interpretations,
+        )
+
+    # Repeat visits: a few people reload their chart many times
+    regulars = charts[:20]
+
+    def cached_grid():
+        cached_grid_html(charts[next(cursor) % len(charts)]["grid"])
+
+    def cached_pdf():
+        cached_pdf_bytes(regulars[next(cursor) % len(regulars)], interpretations)
+
+    grid_cache.clear()
+    pdf_cache.clear()
+    return [
+        measure("render.grid_html", render_grid, iterations=2000),
+        measure("render.generate_pdf", render_pdf, iterations=200),
+        measure("render.cached_grid_html", cached_grid, iterations=2000),
+        measure("render.cached_pdf_repeat_visits", cached_pdf, iterations=2000),
+    ]
+
+def bench_writes(db_path, size, writers, per_writer):
+    """Concurrent save_to_sqlite-style inserts: synchronous and through the write-behind queue."""
+    from storage import UserStore
+    from write_queue import WriteBehindQueue
+
+    results = []
+    store = UserStore(db_path)
+    base = size + 10_000_000 * writers
+
+    def run(save, offset):
+        samples, lock = [], threading.Lock()
+        # Every 10th phone collides with an existing user, like real resubmissions
+        def writer(w):
+            local = []
+            for i in range(per_writer):
+                if i % 10 == 9:
+                    phone = synthetic_phone(i % max(size, 1))
+                else:
+                    phone = synthetic_phone(base + offset + w * per_writer + i)
+                t0 = time.perf_counter()
+                save("Bench", "User", "01-01-1990", "10:10:10", "Bench City", phone, "Male")
+                local.append(time.perf_counter() - t0)
+            with lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+        tracemalloc.start()
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, samples, peak
+
+    elapsed, samples, peak = run(store.insert_user, 0)
+    results.append(_result(f"db.insert_user_{writers}_writers", size, samples, elapsed, len(samples), peak))
+
+    queue = WriteBehindQueue(store)
+    elapsed, samples, peak = run(queue.submit, writers * per_writer)
+    queue.close()
+    results.append(_result(f"db.write_behind_submit_{writers}_writers", size, samples, elapsed, len(samples), peak))
+    store.pool.close()
+    return results
+
+def bench_control_panel(db_path, size, rng):
+    from chart_table import chart_for
+    from compatibility import CompatibilityIndex
+    from storage import UserStore
+
+    store = UserStore(db_path)
+    with store.connection() as conn:
+        dobs = [row[0] for row in conn.execute("SELECT dob FROM users ORDER BY random() LIMIT 200")] or ["01-01-1990"]
+
+    # A cursor roughly in the middle of the table, for a deep keyset page
+    _, deep_cursor = store.fetch_users_page(sort="phone_number", limit=max(size // 2, 1))
+
+    matcher = CompatibilityIndex(store)
+    started = time.perf_counter()
+    matcher.refresh()
+    matcher_load = time.perf_counter() - started
+    charts = [chart_for(f"{row[0]} {row[1]}", row[2], row[6]) for row in synthetic_rows(200, seed=rng.randint(0, 10**6))]
+
+    results = [
+        measure("panel.total_users", store.total_users, size, iterations=500),
+        measure("panel.gender_distribution", lambda: store.user_stats("gender"), size, iterations=500),
+        measure("panel.daily_activity", lambda: store.user_stats("signup_day"), size, iterations=200),
+        measure("panel.first_page", lambda: store.fetch_users_page(limit=50), size, iterations=500),
+        measure("panel.deep_page_by_phone", lambda: store.fetch_users_page(sort="phone_number", after=deep_cursor, limit=50), size, iterations=500),
+        measure("panel.filter_gender_sort_dob", lambda: store.fetch_users_page(sort="dob", gender="Female", limit=50), size, iterations=500),
+        measure("panel.filter_dob", lambda: store.fetch_users_page(dob=rng.choice(dobs), limit=50), size, iterations=500),
+        measure("panel.phone_prefix", lambda: store.fetch_users_page(phone_prefix="+91-12", limit=50), size, iterations=500),
+        measure("panel.lo_shu_missing_distribution", lambda: store.lo_shu_distribution("lo_shu_missing"), size, iterations=500),
+        _result("match.load_index", size, [matcher_load], matcher_load, size, 0),
+        measure("match.top_10", lambda: matcher.top_matches(rng.choice(charts), 10), size, iterations=2000),
+    ]
+    store.pool.close()
+    return results
+
+###############################################################################
+# Runner
+###############################################################################
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, db_dir, writers=8, per_writer=500, seed=0, progress=print):
+    """Run every benchmark (database ones once per size) and return the results document."""
+    rng = random.Random(seed)
+    results = []
+    progress("cold-start imports")
+    startup = measure_import_time(runs=7)
+    results.append({
+        **_result("startup.import_app_modules", None, [ms / 1000 for ms in startup["runs_ms"]], sum(startup["runs_ms"]) / 1000, len(startup["runs_ms"]), 0),
+        "heavy_modules_loaded": startup["heavy_modules_loaded"],
+    })
+    progress("calculations")
+    results += bench_calculations(rng)
+    progress("rendering")
+    results += bench_rendering(rng)
+    for size in sizes:
+        progress(f"database: {size} users")
+        db_path = ensure_database(db_dir, size, seed)
+        # Benchmark writes on a copy so the cached database stays at its nominal size
+        work_path = os.path.join(db_dir, f"work_{size}.db")
+        with sqlite3.connect(db_path) as src, sqlite3.connect(work_path) as dst:
+            src.backup(dst)
+        results += bench_control_panel(work_path, size, rng)
+        results += bench_writes(work_path, size, writers, per_writer)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(work_path + suffix):
+                os.remove(work_path + suffix)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "seed": seed,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+def print_results(document):
+    print(f"{'benchmark':42} {'size':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>11} {'peak KB':>9}")
+    for r in document["results"]:
+        size = "" if r["size"] is None else r["size"]
+        print(
+            f"{r['name']:42} {size:>9} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f}"
+            f" {r['throughput_per_sec']:11.1f} {r['peak_mem_kb']:9.0f}"
+        )
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the PredictMe benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000], help="Synthetic users table sizes, e.g. 10000 1000000 10000000.")
+    parser.add_argument("--db-dir", default="bench_data", help="Where synthetic databases are generated and cached.")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads.")
+    parser.add_argument("--per-writer", type=int, default=500, help="Inserts per writer thread.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json", help="Machine-readable results file.")
+    args = parser.parse_args()
+
+    document = run_benchmarks(args.sizes, args.db_dir, args.writers, args.per_writer, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(document, f, indent=2)
+    print_results(document)
+    print(f"\nResults written to {args.out}")
@@ -0,0 +1,102 @@
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+from chart_table import load_chart_table
+from storage import CHART_COLUMNS, USER_COLUMNS, UserStore, chart_columns, dob_iso, migrate
+from validation import GENDERS
+
+FIRST_NAMES = (
+    "Aarav", "Aditi", "Amit", "Ananya", "Arjun", "Deepa", "Gulapsha", "Ishaan", "Kavya", "Mayank",
+    "Meera", "Mohan", "Neha", "Priya", "Rahul", "Riya", "Rohan", "Sneha", "Surabhi", "Vikram",
+)
+LAST_NAMES = (
+    "Agarwal", "Banerjee", "Das", "Gupta", "Iyer", "Joshi", "Kumar", "Mehta", "Nair", "Parveen",
+    "Patel", "Reddy", "Sharma", "Singh", "Sinha", "Verma",
+)
+PLACES = (
+    "New Delhi, India", "Mumbai, India", "Kolkata, India", "Chennai, India", "Bengaluru, India",
+    "Patna, Bihar", "Sundargarh, Odisha", "Lucknow, India", "Pune, India", "Jaipur, India",
+)
+
+# Phone numbers are i * PHONE_STRIDE mod 10**10: distinct for every i, but not in insert order
+PHONE_STRIDE = 7919
+
+def synthetic_phone(i):
+    return f"+91-{(i * PHONE_STRIDE) % 10**10:010d}"
+
+def synthetic_rows(count, seed=0, start=0):
+    """Yield ``count`` deterministic user rows in ``USER_COLUMNS`` order plus a creation date."""
+    rng = random.Random(seed * 1_000_003 + start)
+    first_day = date(1900, 1, 1).toordinal()
+    last_day = date(2020, 12, 31).toordinal()
+    created_from = datetime(2024, 1, 1)
+    for i in range(start, start + count):
+        dob = date.fromordinal(rng.randint(first_day, last_day))
+        yield (
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            dob.strftime("%d-%m-%Y"),
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            rng.choice(PLACES),
+            synthetic_phone(i),
+            rng.choice(GENDERS),
+            (created_from + timedelta(seconds=rng.randint(0, 365 * 86400))).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+def create_database(path, count, seed=0, batch_size=50_000, progress=None):
+    """
+    Create a users database at ``path`` with ``count`` synthetic rows.
+
+    Rows are bulk-loaded, with their charts, before the aggregate triggers
+    exist; opening the ``UserStore`` afterwards creates them and backfills
+    ``user_stats``.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    migrate(conn)
+    load_chart_table()
+    columns = USER_COLUMNS + ("creation_date",) + CHART_COLUMNS + ("dob_date",)
+    placeholders = ", ".join("?" * len(columns))
+    for start in range(0, count, batch_size):
+        with conn:
+            conn.executemany(
+                f"INSERT INTO users ({', '.join(columns)}) VALUES ({placeholders})",
+                (
+                    (*row, *chart_columns(row[0], row[1], row[2], row[6]), dob_iso(row[2]))
+                    for row in synthetic_rows(min(batch_size, count - start), seed, start)
+                ),
+            )
+        if progress:
+            progress(min(start + batch_size, count))
+    conn.close()
+    store = UserStore(path, pool_size=1)
+    store.pool.close()
+
+def ensure_database(directory, count, seed=0, progress=None):
+    """Return the path of the synthetic database with ``count`` rows, creating it if needed."""
+    path = os.path.join(directory, f"users_{count}_seed{seed}.db")
+    if not os.path.exists(path):
+        create_database(path, count, seed, progress=progress)
+    return path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic users database.")
+    parser.add_argument("count", type=int, help="Number of users.")
+    parser.add_argument("--out", required=True, help="Database file to (re)create.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    create_database(args.out, args.count, args.seed, progress=lambda n: print(f"\r{n} rows", end="", flush=True))
+    print(f"\n{args.out}: {args.count} users in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,244 @@
+import os
+import threading
+from datetime import date
+
+from numerology import (
+    calculate_chaldean_number,
+    calculate_conductor,
+    calculate_driver,
+    calculate_kuaa,
+    generate_lo_shu_grid,
+)
+from validation import GENDERS, parse_dob
+
+# NumPy is only imported by the functions that build or batch-read the table,
+# so single-chart lookups (and app startup) never wait for it.
+
+# Every (date of birth, gender) chart between these dates is precomputed.
+FIRST_DATE = date(1900, 1, 1)
+LAST_DATE = date(2100, 12, 31)
+NUM_DAYS = LAST_DATE.toordinal() - FIRST_DATE.toordinal() + 1
+
+# Per (day, gender) row: driver, conductor, kuaa (0 for "NA"), grid counts 1-9.
+ROW_WIDTH = 12
+
+CHART_TABLE_PATH = os.environ.get("PREDICTME_CHART_TABLE", os.path.join("data", "chart_table.npy"))
+
+_table = None
+_table_lock = threading.Lock()
+_warm_thread = None
+
+def build_chart_table(path=CHART_TABLE_PATH):
+    """
+    Compute every chart in the date range and write it to a ``.npy`` file.
+
+    The file is written next to ``path`` and renamed into place, so readers
+    never see a half-written table.
+
+    Returns:
+        numpy.ndarray: The table, memory-mapped read-only from ``path``.
+    """
+    import numpy as np
+
+    from numerology_batch import compute_charts_from_dates
+
+    offsets = np.arange(NUM_DAYS, dtype=np.int64)
+    days = np.datetime64(FIRST_DATE.isoformat(), "D") + offsets
+    years = days.astype("datetime64[Y]")
+    months = days.astype("datetime64[M]")
+    year = years.astype(np.int64) + 1970
+    month = (months - years).astype(np.int64) + 1
+    day = (days - months).astype(np.int64) + 1
+
+    table = np.empty((NUM_DAYS, len(GENDERS), ROW_WIDTH), dtype=np.uint8)
+    for g, gender in enumerate(GENDERS):
+        charts = compute_charts_from_dates(day, month, year, np.full(NUM_DAYS, gender))
+        table[:, g, 0] = charts.driver
+        table[:, g, 1] = charts.conductor
+        table[:, g, 2] = charts.kuaa
+        table[:, g, 3:] = charts.grid
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+def verify_chart_table(table, step=1):
+    """
+    Check the table against the scalar numerology functions.
+
+    Args:
+        table (numpy.ndarray): A table as returned by ``load_chart_table``.
+        step (int): Check every ``step``-th day (1 checks every day).
+
+    Raises:
+        ValueError: On the first row that does not match.
+    """
+    if table.shape != (NUM_DAYS, len(GENDERS), ROW_WIDTH):
+        raise ValueError(f"Chart table has shape {table.shape}, expected {(NUM_DAYS, len(GENDERS), ROW_WIDTH)}.")
+    first = FIRST_DATE.toordinal()
+    for offset in range(0, NUM_DAYS, step):
+        d = date.fromordinal(first + offset)
+        dob = d.strftime("%d-%m-%Y")
+        driver = calculate_driver(d.day)
+        conductor = calculate_conductor(dob)
+        for g, gender in enumerate(GENDERS):
+            kuaa = calculate_kuaa(d.year, gender)
+            grid = generate_lo_shu_grid(dob, driver, conductor, kuaa)
+            expected = [driver, conductor, kuaa or 0] + [grid[num] for num in range(1, 10)]
+            if table[offset, g].tolist() != expected:
+                raise ValueError(f"Chart table mismatch for {dob} ({gender}).")
+
+def load_chart_table(path=CHART_TABLE_PATH):
+    """
+    Return the memory-mapped chart table, building (and verifying) it on first use.
+    """
+    import numpy as np
+
+    global _table
+    if _table is not None:
+        return _table
+    with _table_lock:
+        if _table is None:
+            table = None
+            if os.path.exists(path):
+                try:
+                    table = np.load(path, mmap_mode="r")
+                    verify_chart_table(table, step=997)
+                except ValueError:
+                    table = None
+            if table is None:
+                table = build_chart_table(path)
+                verify_chart_table(table)
+            _table = table
+    return _table
+
+def warm_chart_table(path=CHART_TABLE_PATH):
+    """Load or build the chart table in a background thread (once per process)."""
+    global _warm_thread
+    with _table_lock:
+        if _warm_thread is None and _table is None:
+            _warm_thread = threading.Thread(target=load_chart_table, args=(path,), name="chart-table-warmup", daemon=True)
+            _warm_thread.start()
+
+def _ready_table():
+    """The table if it is loaded already, otherwise None (callers then compute directly)."""
+    return _table
+
+def lookup_chart(day, month, year, gender):
+    """
+    Return ``(driver, conductor, kuaa, grid)`` for one date of birth.
+
+    Equivalent to calling ``calculate_driver``, ``calculate_conductor``,
+    ``calculate_kuaa`` and ``generate_lo_shu_grid``, but served from the
+    precomputed table when it is loaded and the date is in range.
+    """
+    table = _ready_table()
+    offset = date(year, month, day).toordinal() - FIRST_DATE.toordinal()
+    if table is None or not 0 <= offset < NUM_DAYS or gender not in GENDERS:
+        dob = f"{day:02d}-{month:02d}-{year:04d}"
+        driver = calculate_driver(day)
+        conductor = calculate_conductor(dob)
+        kuaa = calculate_kuaa(year, gender)
+        return driver, conductor, kuaa, generate_lo_shu_grid(dob, driver, conductor, kuaa)
+    row = table[offset, GENDERS.index(gender)].tolist()
+    kuaa = row[2] if gender != "NA" else None
+    return row[0], row[1], kuaa, {num: row[2 + num] for num in range(1, 10)}
+
+def chart_for(full_name, dob, gender):
+    """
+    Return the complete chart of one person as a JSON-friendly dict.
+
+    Raises:
+        ValueError: If ``dob`` is not a DD-MM-YYYY date or ``gender`` is unknown.
+    """
+    if gender not in GENDERS:
+        raise ValueError('gender must be one of "Male", "Female" or "NA".')
+    day, month, year = parse_dob(dob)
+    driver, conductor, kuaa, grid = lookup_chart(day, month, year, gender)
+    return {
+        "full_name": full_name,
+        "dob": dob,
+        "gender": gender,
+        "name_number": calculate_chaldean_number(full_name),
+        "driver": driver,
+        "conductor": conductor,
+        "kuaa": kuaa,
+        "grid": grid,
+    }
+
+def lookup_charts(dobs, genders, names=None):
+    """
+    Batch chart lookup with the same inputs and result as ``numerology_batch.compute_charts``.
+
+    Rows outside the table's date range are computed directly.
+    """
+    from numerology_batch import parse_dobs
+
+    day, month, year = parse_dobs(dobs)
+    return lookup_charts_from_dates(day, month, year, genders, names)
+
+def lookup_charts_from_dates(day, month, year, genders, names=None):
+    """Like ``lookup_charts`` but from already split day, month and year arrays."""
+    import numpy as np
+
+    from numerology_batch import ChartBatch, chaldean_numbers, compute_charts_from_dates
+
+    table = load_chart_table()
+    genders = np.asarray(genders, dtype=str)
+    gender_index = np.full(genders.shape, -1, dtype=np.int64)
+    for g, gender in enumerate(GENDERS):
+        gender_index[genders == gender] = g
+    if (gender_index < 0).any():
+        raise ValueError('gender must be one of "Male", "Female" or "NA".')
+
+    dates = (
+        (np.asarray(year, dtype=np.int64) - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+        + (np.asarray(month, dtype=np.int64) - 1)
+    ).astype("datetime64[D]") + (np.asarray(day, dtype=np.int64) - 1)
+    offsets = (dates - np.datetime64(FIRST_DATE.isoformat(), "D")).astype(np.int64)
+    in_range = (offsets >= 0) & (offsets < NUM_DAYS)
+
+    rows = np.empty((len(offsets), ROW_WIDTH), dtype=np.uint8)
+    rows[in_range] = table[offsets[in_range], gender_index[in_range]]
+    if not in_range.all():
+        out = ~in_range
+        charts = compute_charts_from_dates(
+            np.asarray(day)[out], np.asarray(month)[out], np.asarray(year)[out], genders[out]
+        )
+        rows[out, 0] = charts.driver
+        rows[out, 1] = charts.conductor
+        rows[out, 2] = charts.kuaa
+        rows[out, 3:] = charts.grid
+
+    name_number = chaldean_numbers(names) if names is not None else None
+    return ChartBatch(
+        name_number,
+        rows[:, 0].astype(np.int64),
+        rows[:, 1].astype(np.int64),
+        rows[:, 2].astype(np.int64),
+        rows[:, 3:],
+    )
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Build and verify the precomputed birth chart table.")
+    parser.add_argument("--path", default=CHART_TABLE_PATH, help="Where to write the table.")
+    parser.add_argument("--verify-only", action="store_true", help="Only check an existing table.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.verify_only:
+        chart_table = np.load(args.path, mmap_mode="r")
+    else:
+        chart_table = build_chart_table(args.path)
+    verify_chart_table(chart_table)
+    print(f"{args.path}: {NUM_DAYS} days x {len(GENDERS)} genders verified in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,35 @@
+# Function to build the color-coded cells of the grid, row by row
+def styled_grid_cells(grid):
+    colors = {
+        "missing": "background-color: #f8d7da; color: #721c24;",  # Light red for missing numbers
+        "repeated": "background-color: #d4edda; color: #155724;",  # Light green for repeated numbers
+        "normal": "background-color: #d1ecf1; color: #0c5460;",  # Light blue for normal numbers
+    }
+    lo_shu_layout = [
+        [4, 9, 2],
+        [3, 5, 7],
+        [8, 1, 6]
+    ]
+    styled_data = []
+    for row in lo_shu_layout:
+        styled_row = []
+        for num in row:
+            if grid[num] == 0:
+                style = colors["missing"]
+            elif grid[num] > 1:
+                style = colors["repeated"]
+            else:
+                style = colors["normal"]
+            styled_row.append(f'<div style="{style}">{num}: ({grid[num]})</div>')
+        styled_data.append(styled_row)
+    return styled_data
+
+# Function to render the color-coded grid as an HTML table. The markup is what
+# pandas' DataFrame.to_html(escape=False, index=False, header=False) gives for
+# the cells, built directly so page renders do not need pandas.
+def grid_html(grid):
+    rows = "".join(
+        "    <tr>\n" + "".join(f"      <td>{cell}</td>\n" for cell in row) + "    </tr>\n"
+        for row in styled_grid_cells(grid)
+    )
+    return f'<table border="1" class="dataframe">\n  <tbody>\n{rows}  </tbody>\n</table>'
@@ -0,0 +1,202 @@
+import time
+from datetime import datetime
+
+from storage import dob_iso, get_store, phone_prefix_clause
+from validation import GENDERS
+
+def build_predicate(gender=None, dob_from=None, dob_to=None, phone_prefix=None, created_before=None):
+    """
+    Build a parameterized ``WHERE`` condition on ``users`` from structured filters.
+
+    Args:
+        gender (str, optional): Only users with this gender.
+        dob_from (str, optional): Only users born on or after this DD-MM-YYYY date.
+        dob_to (str, optional): Only users born on or before this DD-MM-YYYY date.
+        phone_prefix (str, optional): Only phone numbers starting with this.
+        created_before (str, optional): Only users saved before this YYYY-MM-DD date
+            (users without a creation date never match).
+
+    Returns:
+        tuple: ``(sql, params)``.
+
+    Raises:
+        ValueError: If a filter is invalid or no filter is given.
+    """
+    clauses, params = [], []
+    if gender:
+        if gender not in GENDERS:
+            raise ValueError('gender must be one of "Male", "Female" or "NA".')
+        clauses.append("gender = ?")
+        params.append(gender)
+    for bound, op in ((dob_from, ">="), (dob_to, "<=")):
+        if bound:
+            iso = dob_iso(bound)
+            if iso is None:
+                raise ValueError("Invalid date format. Please enter in DD-MM-YYYY format.")
+            clauses.append(f"dob_date {op} ?")
+            params.append(iso)
+    if phone_prefix:
+        clause, prefix_params = phone_prefix_clause(phone_prefix)
+        clauses.append(clause)
+        params.extend(prefix_params)
+    if created_before:
+        try:
+            datetime.strptime(created_before, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Invalid creation date. Please enter in YYYY-MM-DD format.") from None
+        clauses.append("creation_date < ?")
+        params.append(created_before)
+    if not clauses:
+        raise ValueError("Choose at least one condition; the whole table is never cleaned at once.")
+    return " AND ".join(clauses), params
+
+def count_matching(store=None, **filters):
+    """Dry run: how many users the filters would delete (counted on every shard in parallel)."""
+    where, params = build_predicate(**filters)
+
+    def count(_, shard):
+        with shard.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM users WHERE {where}", params).fetchone()[0]
+
+    return sum((store or get_store()).scatter(count))
+
+def _delete_from_shard(shard, where, params, chunk_size, pause, progress):
+    with shard.connection() as conn:
+        first, last = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM users").fetchone()
+    deleted = 0
+    if first is None:
+        return deleted
+    start = first - 1
+    while start < last:
+        end = min(start + chunk_size, last)
+        with shard.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.execute(
+                    f"DELETE FROM users WHERE rowid > ? AND rowid <= ? AND {where}",
+                    (start, end, *params),
+                )
+            deleted += cursor.rowcount
+        start = end
+        if progress:
+            progress((start - first + 1) / (last - first + 1), deleted)
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+def delete_matching(store=None, chunk_size=2000, pause=0.01, progress=None, **filters):
+    """
+    Delete the users matching ``filters`` in short transactions.
+
+    Each shard's table is walked in windows of ``chunk_size`` rowids, one
+    transaction per window, so the write lock is only ever held for a
+    bounded amount of work and queued user submissions commit between
+    chunks (``pause`` seconds give them room).
+
+    Args:
+        progress (callable, optional): Called as ``progress(done_fraction, deleted)`` after each chunk.
+
+    Returns:
+        int: Number of users deleted.
+    """
+    where, params = build_predicate(**filters)
+    shards = (store or get_store()).shards
+    deleted = 0
+    # One shard at a time, so progress is reported from the caller's thread
+    for index, shard in enumerate(shards):
+        def shard_progress(done, shard_deleted, index=index, before=deleted):
+            progress((index + done) / len(shards), before + shard_deleted)
+
+        deleted += _delete_from_shard(shard, where, params, chunk_size, pause, shard_progress if progress else None)
+    return deleted
+
+def reclaim_space(store=None, pages_per_step=1000, pause=0.01, progress=None):
+    """
+    Return free pages to the file system with ``PRAGMA incremental_vacuum``, a step at a time.
+
+    Args:
+        progress (callable, optional): Called as ``progress(freed_pages, free_pages_left)``
+            after each step (pages left in the shard being vacuumed).
+
+    Returns:
+        int or None: Pages freed, or None when no database is in
+        incremental auto-vacuum mode (see ``enable_incremental_vacuum``).
+    """
+    freed = None
+    for shard in (store or get_store()).shards:
+        with shard.connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                continue
+            freed = freed or 0
+            while True:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                # executescript steps the pragma to completion; execute() would free one page
+                conn.executescript(f"PRAGMA incremental_vacuum({min(free, pages_per_step)});")
+                left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                freed += free - left
+                if progress:
+                    progress(freed, left)
+                if pause:
+                    time.sleep(pause)
+    return freed
+
+def enable_incremental_vacuum(store=None):
+    """
+    Switch existing databases to incremental auto-vacuum.
+
+    This runs a full ``VACUUM`` of each shard, which rewrites the file and
+    blocks writers while it runs: do it once, in a quiet period. New
+    databases are created in this mode already.
+    """
+    for shard in (store or get_store()).shards:
+        with shard.connection() as conn:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete users matching structured filters, in short transactions.")
+    parser.add_argument("--gender", choices=GENDERS)
+    parser.add_argument("--dob-from", help="Born on or after (DD-MM-YYYY).")
+    parser.add_argument("--dob-to", help="Born on or before (DD-MM-YYYY).")
+    parser.add_argument("--phone-prefix")
+    parser.add_argument("--created-before", help="Saved before (YYYY-MM-DD).")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rowids per transaction.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the matching users.")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space afterwards.")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true", help="One-off full VACUUM into incremental auto-vacuum mode.")
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+        print("Incremental auto-vacuum enabled.")
+    else:
+        filters = {
+            "gender": args.gender,
+            "dob_from": args.dob_from,
+            "dob_to": args.dob_to,
+            "phone_prefix": args.phone_prefix,
+            "created_before": args.created_before,
+        }
+        try:
+            matching = count_matching(**filters)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{matching} matching users")
+        if not args.dry_run and matching:
+            started = time.perf_counter()
+            deleted = delete_matching(
+                chunk_size=args.chunk_size,
+                progress=lambda done, deleted: print(f"\r{done:6.1%} scanned, {deleted} deleted", end="", flush=True),
+                **filters,
+            )
+            print(f"\n{deleted} users deleted in {time.perf_counter() - started:.1f}s")
+            if args.vacuum:
+                freed = reclaim_space()
+                if freed is None:
+                    print("Incremental auto-vacuum is off; run with --enable-incremental-vacuum once to turn it on.")
+                else:
+                    print(f"{freed} pages reclaimed")
@@ -0,0 +1,333 @@
+import threading
+
+import numpy as np
+
+from numerology import LO_SHU_BITS
+
+# Planetary ruler of each number (1-9) and how those rulers regard one another
+# in Vedic numerology: 1 friend, 0.5 neutral, 0 enemy. The relation of a pair
+# is the mean of both directions, so scores are symmetric.
+FRIENDS = {
+    1: {1, 2, 3, 9},
+    2: {1, 2, 5},
+    3: {1, 2, 3, 9},
+    4: {4, 5, 6, 8},
+    5: {1, 5, 6},
+    6: {5, 6, 8},
+    7: {1, 2, 3, 7},
+    8: {4, 5, 6, 8},
+    9: {1, 2, 3, 9},
+}
+ENEMIES = {
+    1: {6, 8},
+    2: set(),
+    3: {5, 6},
+    4: {1, 2, 9},
+    5: {2},
+    6: {1, 2},
+    7: {5},
+    8: {1, 2, 9},
+    9: {5},
+}
+
+# Points for the driver and conductor relations and for how well the two
+# Lo Shu grids fill each other's missing numbers; they add up to 100
+DRIVER_WEIGHT = 30
+CONDUCTOR_WEIGHT = 30
+GRID_WEIGHT = 40
+
+ALL_NUMBERS = (1 << 9) - 1
+
+def _regard(a, b):
+    if b in FRIENDS[a]:
+        return 1.0
+    if b in ENEMIES[a]:
+        return 0.0
+    return 0.5
+
+RELATION = np.zeros((10, 10))
+for _a in range(1, 10):
+    for _b in range(1, 10):
+        RELATION[_a, _b] = (_regard(_a, _b) + _regard(_b, _a)) / 2
+
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(ALL_NUMBERS + 1)], dtype=np.int64)
+
+def single_digit(value):
+    """Reduce a driver or conductor (10 and 11 occur) to 1-9."""
+    while value > 9:
+        value = sum(map(int, str(value)))
+    return value
+
+def present_mask(grid):
+    """Bitmask of the numbers present in a Lo Shu Grid (bit n-1 for number n)."""
+    return sum(1 << (num - 1) for num in range(1, 10) if grid[num])
+
+def _grid_score(mask_a, mask_b):
+    missing_a, missing_b = ALL_NUMBERS & ~mask_a, ALL_NUMBERS & ~mask_b
+    gaps = POPCOUNT[missing_a] + POPCOUNT[missing_b]
+    if not gaps:
+        return 1.0
+    return (POPCOUNT[missing_a & mask_b] + POPCOUNT[missing_b & mask_a]) / gaps
+
+def compatibility(chart_a, chart_b):
+    """
+    Score two charts (as returned by ``chart_for``) for relationship compatibility.
+
+    Returns:
+        dict: ``score`` (0-100), the ``driver_relation`` and
+        ``conductor_relation`` (0-1), and the missing numbers each person's
+        grid supplies to the other (``a_fills``, ``b_fills``).
+    """
+    driver = RELATION[single_digit(chart_a["driver"]), single_digit(chart_b["driver"])]
+    conductor = RELATION[single_digit(chart_a["conductor"]), single_digit(chart_b["conductor"])]
+    mask_a, mask_b = present_mask(chart_a["grid"]), present_mask(chart_b["grid"])
+    grid = _grid_score(mask_a, mask_b)
+    return {
+        "score": round(DRIVER_WEIGHT * driver + CONDUCTOR_WEIGHT * conductor + GRID_WEIGHT * grid),
+        "driver_relation": float(driver),
+        "conductor_relation": float(conductor),
+        "a_fills": [num for num in range(1, 10) if (mask_a & ~mask_b) >> (num - 1) & 1],
+        "b_fills": [num for num in range(1, 10) if (mask_b & ~mask_a) >> (num - 1) & 1],
+    }
+
+# Everything the score depends on fits in one key: (driver, conductor, present mask)
+NUM_KEYS = 9 * 9 * (ALL_NUMBERS + 1)
+
+def _keys(driver, conductor, lo_shu):
+    """Bucket keys of many users from their stored chart columns (int64 arrays)."""
+    mask = np.zeros(len(lo_shu), dtype=np.int64)
+    for i in range(9):
+        mask |= (((lo_shu >> (LO_SHU_BITS * i)) & ((1 << LO_SHU_BITS) - 1)) > 0).astype(np.int64) << i
+    # (value - 1) % 9 + 1 is what single_digit gives for any positive value
+    return (((driver - 1) % 9) * 9 + (conductor - 1) % 9) * (ALL_NUMBERS + 1) + mask
+
+def _runs(keys, user_ids):
+    """Group users by key: yields ``(key, ids)`` with the ids in their original order."""
+    order = np.argsort(keys, kind="stable")
+    keys, user_ids = keys[order], user_ids[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    for key, start, end in zip(keys[starts].tolist(), starts.tolist(), ends.tolist()):
+        yield key, user_ids[start:end]
+
+def _columns(rows):
+    """``(rowid, driver, conductor, lo_shu)`` rows with a chart, as four int64 arrays."""
+    return [np.array(column, dtype=np.int64) for column in zip(*rows)]
+
+_MASKS = np.arange(ALL_NUMBERS + 1)
+
+class CompatibilityIndex:
+    """
+    In-memory index of stored users for "most compatible users" queries.
+
+    Users are bucketed by (driver, conductor, Lo Shu present mask), which is
+    all a score depends on, and each bucket holds its user ids in a NumPy
+    array. A query scores the 41,472 possible buckets at once and reads users
+    only from the best ones, so it costs the same for a thousand users as for
+    millions. Every query first catches up with the store: rows saved since
+    the last one are added, and users deleted since are removed using the
+    store's ``deleted_users`` log.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._buckets = {}  # key -> user ids; the first _counts[key] entries are in use
+        self._counts = np.zeros(NUM_KEYS, dtype=np.int64)
+        self._populated = None  # keys with users, recomputed when a bucket fills, empties or the index is cleared
+        self._last_rowid = {}  # shard index -> last rowid indexed
+        self._last_deletion = {}  # shard index -> last deleted_users seq applied
+        self._seen = {}  # shard index -> rows read and not deleted since (charted or not), to check against the total
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return int(self._counts.sum())
+
+    def _add(self, keys, user_ids):
+        """Append users to their buckets."""
+        with self._lock:
+            for key, ids in _runs(keys, user_ids):
+                count = int(self._counts[key])
+                bucket = self._buckets.get(key)
+                needed = count + len(ids)
+                if bucket is None or len(bucket) < needed:
+                    # Grow by doubling, so appends cost O(1) amortized
+                    grown = np.empty(max(needed, 2 * count, 4), dtype=np.int64)
+                    if bucket is not None:
+                        grown[:count] = bucket[:count]
+                    self._buckets[key] = bucket = grown
+                bucket[count:needed] = ids
+                self._counts[key] = needed
+                if count == 0:
+                    self._populated = None
+
+    def _remove(self, keys, user_ids):
+        """Remove users from their buckets."""
+        with self._lock:
+            for key, ids in _runs(keys, user_ids):
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                kept = bucket[:self._counts[key]]
+                kept = kept[~np.isin(kept, ids)]
+                self._counts[key] = len(kept)
+                if len(kept):
+                    self._buckets[key] = kept
+                else:
+                    del self._buckets[key]
+                    self._populated = None
+
+    def refresh(self, batch_size=50_000):
+        """
+        Catch up with the users saved and deleted since the last refresh (reading the store's shards in parallel).
+
+        Ids only grow, so new users are the rows past each shard's last
+        indexed rowid, and deleted ones are the ``deleted_users`` entries
+        past the last one applied. That log only keeps the latest entries:
+        a shard whose total no longer matches the users indexed from it has
+        lost some the index could not account for, and the index is then
+        rebuilt from scratch.
+
+        Returns:
+            int: Number of users added.
+        """
+        if self.store is None:
+            return 0
+        with self._refresh_lock:
+            results = self.store.scatter(lambda index, shard: self._refresh_shard(index, shard, batch_size))
+            if all(consistent for _, consistent in results):
+                return sum(added for added, _ in results)
+            self._clear()
+            return sum(added for added, _ in self.store.scatter(
+                lambda index, shard: self._refresh_shard(index, shard, batch_size)
+            ))
+
+    def _refresh_shard(self, index, shard, batch_size):
+        """Catch up with one shard; returns ``(added, consistent)``, False if its total does not match."""
+        added = 0
+        with shard.connection() as conn:
+            # One read transaction, so the total, the log and the rows come from the same snapshot
+            conn.execute("BEGIN")
+            try:
+                total = conn.execute("SELECT count FROM user_stats WHERE metric = 'total' AND bucket = ''").fetchone()
+                if index in self._last_deletion:
+                    self._apply_deletions(conn, index, batch_size)
+                else:
+                    # Nothing indexed yet: earlier deletions are already reflected in the rows
+                    self._last_deletion[index] = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM deleted_users").fetchone()[0]
+                while True:
+                    rows = conn.execute(
+                        """
+                        SELECT rowid, driver, conductor, lo_shu FROM users
+                        WHERE rowid > ? ORDER BY rowid LIMIT ?
+                        """,
+                        (self._last_rowid.get(index, 0), batch_size),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    charted = [row for row in rows if row[3] is not None]
+                    if charted:
+                        rowid, driver, conductor, lo_shu = _columns(charted)
+                        self._add(_keys(driver, conductor, lo_shu), self.store.user_id(index, rowid))
+                        added += len(charted)
+                    self._seen[index] = self._seen.get(index, 0) + len(rows)
+                    self._last_rowid[index] = rows[-1][0]
+            finally:
+                conn.rollback()
+        return added, self._seen.get(index, 0) == (total[0] if total else 0)
+
+    def _apply_deletions(self, conn, index, batch_size):
+        """Remove the users of one shard deleted since the last refresh."""
+        last_rowid = self._last_rowid.get(index, 0)
+        while True:
+            rows = conn.execute(
+                """
+                SELECT seq, user_rowid, driver, conductor, lo_shu FROM deleted_users
+                WHERE seq > ? ORDER BY seq LIMIT ?
+                """,
+                (self._last_deletion[index], batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            # Users past the last indexed rowid were deleted before they were read
+            indexed = [row for row in rows if row[1] <= last_rowid]
+            self._seen[index] = self._seen.get(index, 0) - len(indexed)
+            charted = [row[1:] for row in indexed if row[4] is not None]
+            if charted:
+                rowid, driver, conductor, lo_shu = _columns(charted)
+                self._remove(_keys(driver, conductor, lo_shu), self.store.user_id(index, rowid))
+            self._last_deletion[index] = rows[-1][0]
+
+    def _clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._counts[:] = 0
+            self._populated = None
+            self._last_rowid.clear()
+            self._last_deletion.clear()
+            self._seen.clear()
+
+    def bucket_scores(self, chart):
+        """The score ``chart`` would get against a user in each bucket, as an array over keys."""
+        mask = present_mask(chart["grid"])
+        missing = ALL_NUMBERS & ~mask
+        missing_masks = ALL_NUMBERS & ~_MASKS
+        gaps = POPCOUNT[missing] + POPCOUNT[missing_masks]
+        filled = POPCOUNT[missing & _MASKS] + POPCOUNT[missing_masks & mask]
+        grid = np.where(gaps > 0, filled / np.maximum(gaps, 1), 1.0)
+        # (driver, conductor, mask) broadcast in key order
+        return np.rint(
+            DRIVER_WEIGHT * RELATION[single_digit(chart["driver"]), 1:, None, None]
+            + CONDUCTOR_WEIGHT * RELATION[single_digit(chart["conductor"]), None, 1:, None]
+            + GRID_WEIGHT * grid[None, None, :]
+        ).astype(np.int64).ravel()
+
+    def top_matches(self, chart, k=10, exclude=None):
+        """
+        The ``k`` stored users most compatible with ``chart``.
+
+        Args:
+            chart (dict): A chart as returned by ``chart_for``.
+            k (int): Number of users to return.
+            exclude (int, optional): A user id to leave out (the person themself).
+
+        Returns:
+            list: ``(user_id, score)`` pairs, best first.
+        """
+        self.refresh()
+        scores = self.bucket_scores(chart)
+        with self._lock:
+            if self._populated is None:
+                self._populated = np.flatnonzero(self._counts)
+            populated = self._populated
+            # Every bucket holds at least one user, so the best k buckets suffice
+            if len(populated) > k + 1:
+                best = np.argpartition(-scores[populated], k + 1)[:k + 1]
+                populated = populated[best]
+            populated = populated[np.argsort(-scores[populated], kind="stable")]
+            matches = []
+            for key in populated.tolist():
+                user_ids = self._buckets[key][:self._counts[key]]
+                if exclude is not None:
+                    user_ids = user_ids[user_ids != exclude]
+                score = int(scores[key])
+                matches.extend((user_id, score) for user_id in user_ids[:k - len(matches)].tolist())
+                if len(matches) == k:
+                    break
+        return matches
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_matcher():
+    """Return this process's ``CompatibilityIndex`` over the shared store, loaded on first use."""
+    from storage import get_store
+
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                matcher = CompatibilityIndex(get_store())
+                matcher.refresh()
+                _matcher = matcher
+    return _matcher
@@ -1,16 +1,30 @@
+import os
+import tempfile
+import time
 import streamlit as st
-import sqlite3
 import pandas as pd
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import tracing
+from storage import SORT_COLUMNS, STAT_DIMENSIONS, USER_COLUMNS, get_store
 
 # Admin credentials
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "securepassword"
 
-# Function to fetch data from the database
-def fetch_data(query, db_path="user_data.db"):
+# Streamlit holds a download in memory, so larger exports go through export.py instead
+MAX_PANEL_EXPORT_ROWS = int(os.environ.get("PREDICTME_PANEL_EXPORT_ROWS", "500000"))
+
+# Prepared exports live here and are deleted once older than this many seconds
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "predictme_exports")
+EXPORT_MAX_AGE = int(os.environ.get("PREDICTME_EXPORT_MAX_AGE", "3600"))
+
+# Function to read the incrementally maintained user counters
+def fetch_stats():
     try:
-        with sqlite3.connect(db_path) as conn:
-            return pd.read_sql_query(query, conn)
+        store = get_store()
+        with tracing.span("query_user_stats"):
+            return {metric: store.user_stats(metric) for metric in STAT_DIMENSIONS}
     except Exception as e:
         st.error(f"An error occurred: {e}")
         return None
@@ -38,57 +52,346 @@ def control_panel():
     # User insights
     st.header("User Insights")
     
-    # Query to count total users
-    query_total_users = "SELECT COUNT(*) as users FROM users;"
-    result_total_users = fetch_data(query_total_users)
-    if result_total_users is not None:
-        total_users = result_total_users["users"].iloc[0]
-        st.subheader(f"Total Users: {total_users}")
+    # Counters maintained by the storage layer, so this never scans users
+    stats = fetch_stats()
+    if stats is not None:
+        st.subheader(f"Total Users: {stats['total'].get('', 0)}")
     
-    # Show user details
+    # Show user details, one page at a time
     st.subheader("User Details")
-    query_user_details = "SELECT * FROM users;"
-    user_details = fetch_data(query_user_details)
-    if user_details is not None:
-        st.dataframe(user_details)
+    browse_users()
+    export_section()
     
     # Additional insights
     st.header("Additional Insights")
-    # Query for insights like gender distribution
-    query_gender_distribution = """
-        SELECT gender, COUNT(*) as count
-        FROM users
-        GROUP BY gender;
-    """
-    gender_distribution = fetch_data(query_gender_distribution)
-    if gender_distribution is not None:
+    # Insights like gender distribution
+    if stats is not None:
+        gender_distribution = pd.DataFrame(list(stats["gender"].items()), columns=["gender", "count"])
         st.subheader("Gender Distribution")
         st.bar_chart(gender_distribution.set_index("gender"))
 
-# Function to clean the users table based on a condition
-def clean_users_table(condition):
+    # Date-wise activity from the daily/hourly signup rollups
+    if stats is not None:
+        st.subheader("Date-wise User Activity")
+        granularity = st.radio("Granularity", ["Daily", "Hourly (last 7 days)"], horizontal=True)
+        if granularity == "Daily":
+            activity = stats["signup_day"]
+        else:
+            since = (datetime.now(timezone.utc) - timedelta(days=7)).strftime("%Y-%m-%d %H")
+            with tracing.span("query_hourly_activity"):
+                activity = get_store().user_stats("signup_hour", since=since)
+        # Users saved before creation dates were recorded have no bucket
+        activity = {bucket: count for bucket, count in activity.items() if bucket}
+        if activity:
+            date_activity = pd.DataFrame(list(activity.items()), columns=["date", "user_count"])
+            st.line_chart(date_activity.set_index("date"))
+        else:
+            st.info("No activity recorded yet.")
+
+    # Numerology analytics from the stored charts
+    if stats is not None:
+        numerology_insights(stats)
+
+    compatibility_matcher()
+
+    performance_section()
+
+# Most compatible stored users for a given chart, from the in-memory matcher
+def compatibility_matcher():
+    from chart_table import chart_for
+    from compatibility import get_matcher
+
+    st.header("Compatibility Matcher")
+    with st.form("compatibility_matcher"):
+        col1, col2, col3 = st.columns(3)
+        name = col1.text_input("Full Name", placeholder="e.g., Mohan Kumar")
+        dob = col2.text_input("Date of Birth (DD-MM-YYYY)", placeholder="e.g., 25-11-1987", key="matcher_dob")
+        gender = col3.selectbox("Gender", ["Male", "Female", "NA"], key="matcher_gender")
+        k = st.slider("Matches", min_value=5, max_value=100, value=10, step=5)
+        submitted = st.form_submit_button("Find Matches")
+    if not submitted:
+        return
+    try:
+        chart = chart_for(name, dob, gender)
+    except ValueError:
+        st.error("Invalid date format. Please enter in DD-MM-YYYY format.")
+        return
     try:
-        conn = sqlite3.connect('user_data.db')
-        cursor = conn.cursor()
-        query = f"DELETE FROM users WHERE {condition}"
-        cursor.execute(query)
-        conn.commit()
-        st.success(f"Successfully deleted rows where {condition}.")
+        with tracing.span("compatibility_top_matches"):
+            matches = get_matcher().top_matches(chart, k)
+        with tracing.span("query_users_by_id"):
+            users = {row[0]: row[1:] for row in get_store().fetch_users(user_id for user_id, _ in matches)}
     except Exception as e:
         st.error(f"An error occurred: {e}")
-    finally:
-        conn.close()
-
-    # Query for date-wise activity
-#    query_date_activity = """
-#        SELECT DATE(creation_date) as date, COUNT(*) as user_count
-#        FROM users
-#        GROUP BY DATE(creation_date);
-#    """
-#    date_activity = fetch_data(query_date_activity)
-#    if date_activity is not None:
-#        st.subheader("Date-wise User Activity")
-#        st.line_chart(date_activity.set_index("date"))
+        return
+    st.dataframe(
+        pd.DataFrame(
+            [(score, *users[user_id]) for user_id, score in matches if user_id in users],
+            columns=["score", *USER_COLUMNS],
+        ),
+        hide_index=True,
+    )
+
+# Chart rollups kept by the storage layer: histograms and Lo Shu distributions
+def numerology_insights(stats):
+    st.header("Numerology Insights")
+    # Users whose date of birth could not be charted have no bucket
+    charted = stats["total"].get("", 0) - stats["driver"].get("", 0)
+    if charted <= 0:
+        st.info("No charts stored yet.")
+        return
+
+    col1, col2 = st.columns(2)
+    for col, metric in ((col1, "driver"), (col2, "conductor")):
+        histogram = pd.DataFrame(
+            sorted((int(bucket), count) for bucket, count in stats[metric].items() if bucket),
+            columns=[metric, "users"],
+        )
+        col.subheader(f"{metric.title()} Distribution")
+        col.bar_chart(histogram.set_index(metric))
+
+    try:
+        with tracing.span("query_lo_shu_distribution"):
+            missing = get_store().lo_shu_distribution("lo_shu_missing")
+            repeated = get_store().lo_shu_distribution("lo_shu_repeated")
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
+    st.subheader("Missing and Repeated Numbers (% of users)")
+    distribution = pd.DataFrame(
+        {
+            "missing": [100 * missing[num] / charted for num in range(1, 10)],
+            "repeated": [100 * repeated[num] / charted for num in range(1, 10)],
+        },
+        index=pd.Index(range(1, 10), name="number"),
+    )
+    st.bar_chart(distribution, stack=False)
+
+    st.subheader("Most Common Missing Combinations")
+    combinations = sorted(
+        ((count, int(bucket)) for bucket, count in stats["lo_shu_missing"].items() if bucket),
+        reverse=True,
+    )[:10]
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "missing numbers": ", ".join(str(num) for num in range(1, 10) if mask >> (num - 1) & 1) or "none",
+                    "users": count,
+                    "% of users": round(100 * count / charted, 2),
+                }
+                for count, mask in combinations
+            ]
+        ),
+        hide_index=True,
+    )
+
+# Hot-path timings recorded by the tracing layer
+def performance_section():
+    from render_cache import cache_stats
+
+    st.header("Performance")
+    st.subheader("Render Caches")
+    caches = pd.DataFrame(cache_stats()).set_index("cache")
+    caches["hit_rate"] = (100 * caches["hit_rate"]).round(1)
+    st.dataframe(caches.rename(columns={"hit_rate": "hit_rate_%"}))
+
+    stats = tracing.stage_stats()
+    if not stats:
+        st.info("No timings recorded yet.")
+        return
+    st.subheader("Stage Latency (ms)")
+    st.dataframe(pd.DataFrame(stats).set_index("stage").round(2))
+
+    st.subheader("Slowest Recent Requests")
+    slowest = [
+        {
+            "request": r["name"],
+            "started": datetime.fromtimestamp(r["started"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": round(r["duration_ms"], 2),
+            **{stage: round(ms, 2) for stage, ms in r["stages"].items()},
+        }
+        for r in tracing.slowest_requests()
+    ]
+    st.dataframe(pd.DataFrame(slowest))
+    st.download_button("Export spans (JSON lines)", data=tracing.export_spans, file_name="predictme_spans.jsonl", mime="application/json")
+
+# Reads a prepared export file for the download button
+def read_export(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+# Deletes a prepared export file that is no longer offered for download
+def remove_export(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Deletes the exports of sessions that ended or went idle without replacing them
+def sweep_exports():
+    cutoff = time.time() - EXPORT_MAX_AGE
+    with os.scandir(EXPORT_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+# Writes this session's export file, replacing the one it prepared before
+def prepare_export(fmt, total):
+    from export import export_users
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    sweep_exports()
+    # Each session gets its own file, so concurrent admins never overwrite each other's export
+    fd, path = tempfile.mkstemp(prefix="predictme_users_", suffix=f".{fmt}", dir=EXPORT_DIR)
+    os.close(fd)
+    bar = st.progress(0.0, text="Exporting...")
+    try:
+        with tracing.span("export_users"):
+            count = export_users(path, fmt, progress=lambda n: bar.progress(min(n / total, 1.0), text=f"{n} users exported"))
+    except Exception as e:
+        remove_export(path)
+        st.error(f"An error occurred: {e}")
+        return
+    # Users saved while exporting can still push it past the cap
+    if count > MAX_PANEL_EXPORT_ROWS:
+        remove_export(path)
+        st.error(export_too_large(fmt))
+        return
+    previous = st.session_state.get("export_file")
+    if previous is not None:
+        remove_export(previous[0])
+    st.session_state["export_file"] = (path, fmt, count)
+
+# Message for tables too large to export from the panel
+def export_too_large(fmt):
+    return f"The panel exports at most {MAX_PANEL_EXPORT_ROWS} users; run `python export.py users.{fmt}` on the server instead."
+
+# Streams every user and chart to a server-side file, then offers it for download
+def export_section():
+    with st.expander("Export users and charts"):
+        fmt = st.radio("Format", ["csv", "parquet"], horizontal=True, format_func=str.upper, key="export_format")
+        if st.button("Prepare Export"):
+            total = max(get_store().total_users(), 1)
+            if total > MAX_PANEL_EXPORT_ROWS:
+                st.error(export_too_large(fmt))
+            else:
+                prepare_export(fmt, total)
+        prepared = st.session_state.get("export_file")
+        if prepared is not None and os.path.exists(prepared[0]):
+            path, prepared_fmt, count = prepared
+            st.caption(f"{count} users exported to {path}. Tables over {MAX_PANEL_EXPORT_ROWS} users are exported with `python export.py users.{prepared_fmt}`.")
+            st.download_button(
+                f"Download {prepared_fmt.upper()}",
+                data=partial(read_export, path),
+                file_name=f"predictme_users.{prepared_fmt}",
+                mime="text/csv" if prepared_fmt == "csv" else "application/vnd.apache.parquet",
+            )
+
+# Paginated user browser: only the visible page is ever loaded
+def browse_users(page_size=50):
+    col1, col2, col3 = st.columns(3)
+    gender = col1.selectbox("Gender", ["All", "Male", "Female", "NA"])
+    dob = col2.text_input("Date of Birth (DD-MM-YYYY)", placeholder="e.g., 25-11-1987")
+    phone_prefix = col3.text_input("Phone number starts with", placeholder="e.g., +91-98")
+    col1, col2 = st.columns(2)
+    sort = col1.selectbox("Sort by", SORT_COLUMNS, format_func=lambda column: "Signup order" if column == "rowid" else column)
+    descending = col2.toggle("Descending")
+
+    # Restart from the first page whenever the filters or the sort change
+    view = (gender, dob, phone_prefix, sort, descending)
+    if st.session_state.get("users_view") != view:
+        st.session_state["users_view"] = view
+        st.session_state["users_cursors"] = [None]
+    cursors = st.session_state["users_cursors"]
+
+    try:
+        with tracing.span("query_users_page"):
+            rows, next_cursor = get_store().fetch_users_page(
+                sort=sort,
+                descending=descending,
+                after=cursors[-1],
+                limit=page_size,
+                gender=None if gender == "All" else gender,
+                dob=dob or None,
+                phone_prefix=phone_prefix or None,
+            )
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
+    st.dataframe(pd.DataFrame([row[1:] for row in rows], columns=USER_COLUMNS))
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)}")
+    if col3.button("Next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# Structured, chunked cleanup of the users table: count first, then delete in short transactions
+def clean_users_table():
+    from cleanup import count_matching, delete_matching, reclaim_space
+
+    st.subheader("Clean Users Table")
+    col1, col2, col3 = st.columns(3)
+    gender = col1.selectbox("Gender", ["Any", "Male", "Female", "NA"], key="cleanup_gender")
+    dob_from = col2.text_input("Born on or after (DD-MM-YYYY)", key="cleanup_dob_from")
+    dob_to = col3.text_input("Born on or before (DD-MM-YYYY)", key="cleanup_dob_to")
+    col1, col2 = st.columns(2)
+    phone_prefix = col1.text_input("Phone number starts with", key="cleanup_phone_prefix")
+    created_before = col2.date_input("Saved before", value=None, key="cleanup_created_before")
+    filters = {
+        "gender": None if gender == "Any" else gender,
+        "dob_from": dob_from or None,
+        "dob_to": dob_to or None,
+        "phone_prefix": phone_prefix or None,
+        "created_before": created_before.isoformat() if created_before else None,
+    }
+
+    # A delete is only offered for the exact filters that were just counted
+    if st.button("Count Matching Users"):
+        try:
+            with tracing.span("cleanup_count"):
+                st.session_state["cleanup_count"] = (filters, count_matching(**filters))
+        except ValueError as e:
+            st.session_state.pop("cleanup_count", None)
+            st.warning(str(e))
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+    counted = st.session_state.get("cleanup_count")
+    if counted is None or counted[0] != filters:
+        st.caption("Count the matching users before deleting them.")
+        return
+    matching = counted[1]
+    st.info(f"{matching} users match these conditions.")
+    if not matching:
+        return
+
+    vacuum = st.checkbox("Reclaim disk space afterwards (incremental vacuum)")
+    if st.button(f"Delete {matching} Users", type="primary"):
+        bar = st.progress(0.0, text="Deleting...")
+        try:
+            with tracing.span("cleanup_delete"):
+                deleted = delete_matching(
+                    progress=lambda done, deleted: bar.progress(min(done, 1.0), text=f"{deleted} users deleted"),
+                    **filters,
+                )
+            st.session_state.pop("cleanup_count", None)
+            st.success(f"Successfully deleted {deleted} users.")
+            if vacuum:
+                with tracing.span("cleanup_vacuum"):
+                    freed = reclaim_space()
+                if freed is None:
+                    st.info("Incremental vacuum is not enabled for this database; run `python cleanup.py --enable-incremental-vacuum` once in a quiet period.")
+                else:
+                    st.success(f"Reclaimed {freed} pages.")
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
 
 # Main function for the control panel app
 def main():
@@ -101,20 +404,7 @@ def main():
         control_panel()
         # Admin Control Section
         st.header("Admin Control")
-        st.subheader("Clean Users Table")
-
-        # Text input for the condition
-        condition = st.text_input(
-            "Enter the SQL condition to clean the users table (e.g., gender = 'NA'):",
-            placeholder="gender = 'NA'",
-        )
-
-        # Trigger the function on button click
-        if st.button("Clean Table"):
-            if condition:
-                clean_users_table(condition)
-            else:
-                st.warning("Please provide a valid condition.")
+        clean_users_table()
     else:
         admin_login()
 
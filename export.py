@@ -0,0 +1,120 @@
+import csv
+import os
+from functools import lru_cache
+
+from numerology import unpack_lo_shu
+from storage import USER_COLUMNS, get_store
+
+# Columns of an export: the user, its chart, and the Lo Shu count of each number
+CHART_FIELDS = ("name_number", "driver", "conductor", "kuaa")
+GRID_FIELDS = tuple(f"lo_shu_{num}" for num in range(1, 10))
+EXPORT_COLUMNS = ("id",) + USER_COLUMNS + ("creation_date",) + CHART_FIELDS + GRID_FIELDS
+
+FORMATS = ("csv", "parquet")
+
+# Few distinct grids exist, so each packed value is unpacked once
+@lru_cache(maxsize=4096)
+def _grid_counts(lo_shu):
+    if lo_shu is None:
+        return (None,) * len(GRID_FIELDS)
+    return tuple(unpack_lo_shu(lo_shu).values())
+
+def export_rows(rows):
+    """Turn ``UserStore.iter_user_chunks`` rows into ``EXPORT_COLUMNS`` rows (grid counts unpacked)."""
+    return [(*row[:-1], *_grid_counts(row[-1])) for row in rows]
+
+def _write_csv(path, chunks, progress):
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(export_rows(rows))
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [("id", pa.int64())]
+        + [(column, pa.string()) for column in USER_COLUMNS + ("creation_date",)]
+        + [(column, pa.int8()) for column in CHART_FIELDS + GRID_FIELDS]
+    )
+
+def _write_parquet(path, chunks, progress):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).") from None
+
+    schema = parquet_schema()
+    written = 0
+    # One row group per chunk, so only one chunk is ever in memory
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in chunks:
+            columns = list(zip(*export_rows(rows)))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+def export_users(path, fmt=None, store=None, chunk_size=10_000, progress=None):
+    """
+    Write every user and its chart to a CSV or Parquet file, streaming.
+
+    Memory use depends on ``chunk_size``, not on the number of users. The
+    file is written next to ``path`` and renamed into place when complete.
+
+    Args:
+        path (str): Output file.
+        fmt (str, optional): ``"csv"`` or ``"parquet"``; taken from the extension by default.
+        progress (callable, optional): Called with the number of rows written after each chunk.
+
+    Returns:
+        int: Number of users exported.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    chunks = (store or get_store()).iter_user_chunks(chunk_size)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        written = (_write_csv if fmt == "csv" else _write_parquet)(tmp_path, chunks, progress)
+        os.replace(tmp_path, path)
+    finally:
+        chunks.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from storage import open_store
+
+    parser = argparse.ArgumentParser(description="Export users and their charts to CSV or Parquet.")
+    parser.add_argument("output", help="Output file; .csv or .parquet.")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the output file's extension.")
+    parser.add_argument("--db", help="Users database (default: the app's); the base name of the shard files with PREDICTME_STORAGE=sharded.")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows read and written at a time.")
+    args = parser.parse_args()
+
+    if (args.format or os.path.splitext(args.output)[1].lstrip(".").lower()) not in FORMATS:
+        parser.error("the output must end in .csv or .parquet, or pass --format")
+    started = time.perf_counter()
+    count = export_users(
+        args.output,
+        args.format,
+        open_store(db_path=args.db, pool_size=1) if args.db else None,
+        args.chunk_size,
+        progress=lambda n: print(f"\r{n} users", end="", flush=True),
+    )
+    print(f"\n{count} users exported to {args.output} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import time
+
+from numerology import LO_SHU_BITS
+from storage import USER_COLUMNS, get_store
+from validation import validate_user
+
+FORMATS = ("csv", "ndjson")
+
+# Columns of the reject file: where the record was, what it held and why it was refused
+REJECT_COLUMNS = ("line",) + USER_COLUMNS + ("reason",)
+
+DUPLICATE_IN_BATCH = "Duplicate phone number in the file."
+ALREADY_EXISTS = "Record already exists for this phone number."
+
+def iter_records(path, fmt=None):
+    """
+    Read user records from a CSV file (with a header row) or an NDJSON file.
+
+    Yields:
+        tuple: ``(line, record, error)``; ``record`` is a dict (None when
+        ``error`` says why the line could not be read).
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown input format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError:
+                    yield line, None, "Invalid JSON."
+                    continue
+                if isinstance(record, dict):
+                    yield line, record, None
+                else:
+                    yield line, None, "Each line must be a JSON object."
+
+def _values(record):
+    return tuple(str(record.get(column) or "").strip() for column in USER_COLUMNS)
+
+def _chart_rows(valid):
+    """Compute the charts of a batch of valid users at once and append them as ``CHART_COLUMNS``."""
+    import numpy as np
+
+    from chart_table import lookup_charts_from_dates
+
+    day, month, year = (np.array(column) for column in zip(*(parts for _, _, parts in valid)))
+    charts = lookup_charts_from_dates(
+        day, month, year,
+        [values[6] for _, values, _ in valid],
+        [f"{values[0]} {values[1]}" for _, values, _ in valid],
+    )
+    packed = (charts.grid.astype(np.int64) << (LO_SHU_BITS * np.arange(9))).sum(axis=1)
+    return [
+        (*values, name_number, driver, conductor, kuaa, lo_shu)
+        for (_, values, _), name_number, driver, conductor, kuaa, lo_shu in zip(
+            valid,
+            charts.name_number.tolist(),
+            charts.driver.tolist(),
+            charts.conductor.tolist(),
+            charts.kuaa.tolist(),
+            packed.tolist(),
+        )
+    ]
+
+def ingest_file(path, fmt=None, store=None, rejects_path=None, batch_size=20_000, progress=None):
+    """
+    Validate and save the users in a CSV or NDJSON file, a batch at a time.
+
+    Each record gets the checks of the app's form (``validation.validate_user``);
+    valid ones are deduplicated on phone number (within the batch and against
+    the database, which already holds the earlier batches), charted together
+    and inserted with one ``executemany`` per batch in a single transaction.
+    Memory depends on ``batch_size``, not on the size of the file.
+
+    Args:
+        rejects_path (str, optional): CSV file receiving every refused record and the reason.
+        progress (callable, optional): Called with the running stats after each batch.
+
+    Returns:
+        dict: ``read``, ``inserted``, ``rejected``, ``duplicates``, ``seconds`` and ``rows_per_minute``.
+    """
+    store = store or get_store()
+    stats = {"read": 0, "inserted": 0, "rejected": 0, "duplicates": 0}
+    started = time.perf_counter()
+    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8") if rejects_path else None
+    try:
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(REJECT_COLUMNS)
+
+        def reject(line, values, reason):
+            stats["rejected"] += 1
+            if reason in (DUPLICATE_IN_BATCH, ALREADY_EXISTS):
+                stats["duplicates"] += 1
+            if rejects:
+                rejects.writerow((line, *values, reason))
+
+        batch = []
+        records = iter_records(path, fmt)
+        while True:
+            batch.clear()
+            for item in records:
+                batch.append(item)
+                if len(batch) == batch_size:
+                    break
+            if not batch:
+                break
+
+            valid, phones = [], set()
+            for line, record, error in batch:
+                stats["read"] += 1
+                if error:
+                    reject(line, ("",) * len(USER_COLUMNS), error)
+                    continue
+                values = _values(record)
+                parts, reason = validate_user(*values)
+                if reason:
+                    reject(line, values, reason)
+                elif values[5] in phones:
+                    reject(line, values, DUPLICATE_IN_BATCH)
+                else:
+                    phones.add(values[5])
+                    valid.append((line, values, parts))
+
+            existing = store.existing_phones(phones)
+            if existing:
+                for line, values, _ in valid:
+                    if values[5] in existing:
+                        reject(line, values, ALREADY_EXISTS)
+                valid = [item for item in valid if item[1][5] not in existing]
+            if valid:
+                skipped = []
+                stats["inserted"] += store.insert_users(_chart_rows(valid), charted=True, skipped=skipped)
+                # Saved by someone else since the lookup
+                lines = {values[5]: line for line, values, _ in valid}
+                for row in skipped:
+                    reject(lines[row[5]], row[:len(USER_COLUMNS)], ALREADY_EXISTS)
+            if progress:
+                progress(dict(stats))
+    finally:
+        if rejects_file:
+            rejects_file.close()
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_minute"] = stats["read"] / stats["seconds"] * 60 if stats["seconds"] else 0.0
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage import open_store
+
+    parser = argparse.ArgumentParser(description="Bulk-load users from a CSV or NDJSON file.")
+    parser.add_argument("input", help="CSV (with a header row) or NDJSON file with the users columns.")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the input file's extension.")
+    parser.add_argument("--rejects", help="CSV file for refused records and their reasons.")
+    parser.add_argument("--db", help="Users database (default: the app's); the base name of the shard files with PREDICTME_STORAGE=sharded.")
+    parser.add_argument("--batch-size", type=int, default=20_000, help="Records validated and committed together.")
+    args = parser.parse_args()
+
+    try:
+        result = ingest_file(
+            args.input,
+            args.format,
+            open_store(db_path=args.db) if args.db else None,
+            args.rejects,
+            args.batch_size,
+            progress=lambda s: print(f"\r{s['read']} read, {s['inserted']} saved, {s['rejected']} rejected", end="", flush=True),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(
+        f"\n{result['inserted']} users saved, {result['rejected']} rejected"
+        f" ({result['duplicates']} duplicate phone numbers) in {result['seconds']:.1f}s"
+        f" - {result['rows_per_minute']:,.0f} rows/minute"
+    )
@@ -0,0 +1,95 @@
+# Chaldean letter-to-number mapping
+CHALDEAN_MAP = {
+    'A': 1, 'I': 1, 'J': 1, 'Q': 1, 'Y': 1,
+    'B': 2, 'K': 2, 'R': 2,
+    'C': 3, 'G': 3, 'L': 3, 'S': 3,
+    'D': 4, 'M': 4, 'T': 4,
+    'E': 5, 'H': 5, 'N': 5, 'X': 5,
+    'U': 6, 'V': 6, 'W': 6,
+    'O': 7, 'Z': 7,
+    'F': 8, 'P': 8
+}
+
+def calculate_chaldean_number(name):
+    """
+    Calculate the Chaldean numerology number for a given name.
+
+    Args:
+        name (str): The full name to calculate the number for.
+
+    Returns:
+        int: The Chaldean numerology number.
+    """
+    # Sanitize and process the name
+    name = name.upper()  # Convert to uppercase for consistent mapping
+    name = ''.join(filter(str.isalpha, name))  # Remove non-alphabetic characters
+
+    # Calculate the Chaldean number
+    total_value = sum(CHALDEAN_MAP.get(letter, 0) for letter in name)
+
+    # Reduce to a single digit unless it's 11 or 22 (master numbers)
+    while total_value > 9 and total_value not in (11, 22):
+        total_value = sum(int(digit) for digit in str(total_value))
+
+    return total_value
+
+# Function to calculate Driver value
+def calculate_driver(day):
+    return sum(map(int, str(day)))
+
+# Function to calculate Conductor value
+def calculate_conductor(dob):
+    digits = [int(char) for char in dob if char.isdigit()]
+    while len(digits) > 1:
+        digits = [sum(map(int, str(sum(digits))))]
+    return digits[0]
+
+# Function to calculate kuaa value
+def calculate_kuaa(year, gender):
+    if gender == "NA":
+        return None  # Cannot calculate kuaa for unspecified gender
+    year_sum = sum(map(int, str(year)))
+    while year_sum >= 10:
+        year_sum = sum(map(int, str(year_sum)))
+    if gender == "Male":
+        kuaa = 11 - year_sum
+    elif gender == "Female":
+        kuaa = 4 + year_sum
+    while kuaa >= 10:
+        kuaa = sum(map(int, str(kuaa)))
+    return kuaa
+
+# Function to generate Lo Shu Grid
+def generate_lo_shu_grid(dob, driver, conductor, kuaa):
+    digits = [int(char) for char in dob if char.isdigit()]
+    digits.append(driver)
+    digits.append(conductor)
+    digits.append(kuaa)
+    grid = {num: digits.count(num) for num in range(1, 10)}
+    return grid
+
+# Lo Shu counts packed into one integer, 4 bits per number (number n at bits
+# 4*(n-1)); a count never exceeds 11, the digits of a date plus three values
+LO_SHU_BITS = 4
+
+# Function to pack a Lo Shu Grid into an integer
+def pack_lo_shu(grid):
+    return sum(grid[num] << (LO_SHU_BITS * (num - 1)) for num in range(1, 10))
+
+# Function to unpack a Lo Shu Grid packed by pack_lo_shu
+def unpack_lo_shu(packed):
+    return {num: (packed >> (LO_SHU_BITS * (num - 1))) & 0xF for num in range(1, 10)}
+
+# Function to generate interpretations
+def number_interpretations():
+    return {
+        1: "Leadership, independence, ambition, and self-confidence.",
+        2: "Cooperation, sensitivity, and diplomacy.",
+        3: "Creativity, joy, and social interaction.",
+        4: "Practicality, stability, and responsibility.",
+        5: "Freedom, adventure, and adaptability.",
+        6: "Love, family, and nurturing.",
+        7: "Spirituality, introspection, and analysis.",
+        8: "Material success, authority, and power.",
+        9: "Compassion, humanitarianism, and selflessness.",
+    }
@@ -0,0 +1,219 @@
+import numpy as np
+
+from numerology import CHALDEAN_MAP
+
+# ASCII code point -> Chaldean value, covering both letter cases so that the
+# batch path only has to upper-case the (rare) names with non-ASCII letters.
+_LETTER_TABLE = np.zeros(128, dtype=np.int64)
+for _letter, _value in CHALDEAN_MAP.items():
+    _LETTER_TABLE[ord(_letter)] = _value
+    _LETTER_TABLE[ord(_letter.lower())] = _value
+
+class ChartBatch:
+    """
+    Numerology charts for many people at once, one array entry per person.
+
+    ``kuaa`` is 0 where the scalar ``calculate_kuaa`` returns None (gender "NA"),
+    and ``name_number`` is None when no names were given. ``grid`` is an
+    (n, 9) matrix whose column ``k`` holds the Lo Shu count of number ``k + 1``.
+    """
+
+    __slots__ = ("name_number", "driver", "conductor", "kuaa", "grid")
+
+    def __init__(self, name_number, driver, conductor, kuaa, grid):
+        self.name_number = name_number
+        self.driver = driver
+        self.conductor = conductor
+        self.kuaa = kuaa
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.driver)
+
+    def grid_dict(self, i):
+        """Return row ``i`` in the ``{number: count}`` form of ``generate_lo_shu_grid``."""
+        return {num: int(self.grid[i, num - 1]) for num in range(1, 10)}
+
+    def to_frame(self):
+        """Return the batch as a pandas DataFrame with ``grid_1`` .. ``grid_9`` columns."""
+        import pandas as pd
+
+        columns = {
+            "driver": self.driver,
+            "conductor": self.conductor,
+            "kuaa": self.kuaa,
+        }
+        if self.name_number is not None:
+            columns = {"name_number": self.name_number, **columns}
+        for num in range(1, 10):
+            columns[f"grid_{num}"] = self.grid[:, num - 1]
+        return pd.DataFrame(columns)
+
+def _digit_sum(values):
+    """Sum of the decimal digits of each element of a non-negative int array."""
+    values = np.asarray(values, dtype=np.int64).copy()
+    total = np.zeros_like(values)
+    while values.any():
+        total += values % 10
+        values //= 10
+    return total
+
+def _digit_counts(values, out):
+    """Add the count of each decimal digit 1-9 of ``values`` into ``out`` (n, 9)."""
+    values = np.asarray(values, dtype=np.int64).copy()
+    rows = np.arange(len(values))
+    while values.any():
+        digit = values % 10
+        present = digit > 0
+        np.add.at(out, (rows[present], digit[present] - 1), 1)
+        values //= 10
+
+def _add_single(values, out):
+    """Count ``values`` that fall in 1-9 into ``out``, like ``list.count`` does."""
+    values = np.asarray(values, dtype=np.int64)
+    hit = (values >= 1) & (values <= 9)
+    rows = np.nonzero(hit)[0]
+    np.add.at(out, (rows, values[hit] - 1), 1)
+
+def chaldean_numbers(names):
+    """
+    Vectorized ``calculate_chaldean_number`` for a sequence of names.
+
+    Args:
+        names (sequence of str): Full names.
+
+    Returns:
+        numpy.ndarray: The Chaldean numerology number of each name.
+    """
+    names = np.asarray(names, dtype=str)
+    if names.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    width = max(names.dtype.itemsize // 4, 1)
+    codes = names.astype(f"U{width}").view(np.uint32).reshape(len(names), width)
+
+    ascii_codes = np.minimum(codes, 127)
+    totals = _LETTER_TABLE[ascii_codes].sum(axis=1)
+
+    # str.upper can turn a non-ASCII letter into ASCII ones (e.g. "ß" -> "SS"),
+    # so those few names take the scalar path to stay exact.
+    for i in np.nonzero((codes > 127).any(axis=1))[0]:
+        totals[i] = sum(CHALDEAN_MAP.get(letter, 0) for letter in str(names[i]).upper())
+
+    pending = (totals > 9) & (totals != 11) & (totals != 22)
+    while pending.any():
+        totals[pending] = _digit_sum(totals[pending])
+        pending = (totals > 9) & (totals != 11) & (totals != 22)
+    return totals
+
+def parse_dobs(dobs):
+    """
+    Split DD-MM-YYYY date strings (or datetime64 values) into day, month and year arrays.
+
+    Raises:
+        ValueError: If a string is not a valid DD-MM-YYYY date.
+    """
+    dobs = np.asarray(dobs)
+    if np.issubdtype(dobs.dtype, np.datetime64):
+        days = dobs.astype("datetime64[D]")
+        years = days.astype("datetime64[Y]")
+        months = days.astype("datetime64[M]")
+        year = years.astype(np.int64) + 1970
+        month = (months - years).astype(np.int64) + 1
+        day = (days - months).astype(np.int64) + 1
+        return day, month, year
+
+    from validation import parse_dob
+
+    dobs = dobs.astype(str)
+    day = np.empty(len(dobs), dtype=np.int64)
+    month = np.empty(len(dobs), dtype=np.int64)
+    year = np.empty(len(dobs), dtype=np.int64)
+    if len(dobs) == 0:
+        return day, month, year
+
+    # Fast path: well-formed, zero-padded "DD-MM-YYYY" strings.
+    width = max(dobs.dtype.itemsize // 4, 1)
+    codes = dobs.astype(f"U{max(width, 10)}").view(np.uint32).reshape(len(dobs), -1)
+    digits = codes[:, :10].astype(np.int64) - ord("0")
+    digit_cols = [0, 1, 3, 4, 6, 7, 8, 9]
+    fixed = (
+        (codes[:, 2] == ord("-"))
+        & (codes[:, 5] == ord("-"))
+        & ((digits[:, digit_cols] >= 0) & (digits[:, digit_cols] <= 9)).all(axis=1)
+        & (codes[:, 10:] == 0).all(axis=1)
+    )
+    day[:] = digits[:, 0] * 10 + digits[:, 1]
+    month[:] = digits[:, 3] * 10 + digits[:, 4]
+    year[:] = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+
+    # Calendar check for the fast path, via datetime64 round-tripping.
+    candidate = np.nonzero(fixed)[0]
+    in_range = (month[candidate] >= 1) & (month[candidate] <= 12) & (day[candidate] >= 1) & (year[candidate] >= 1)
+    ok = candidate[in_range]
+    starts = (year[ok] - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month[ok] - 1)
+    ends = (starts + 1).astype("datetime64[D]")
+    month_len = (ends - starts.astype("datetime64[D]")).astype(np.int64)
+    fixed[ok[day[ok] > month_len]] = False
+    fixed[candidate[~in_range]] = False
+
+    # Anything else (e.g. "5-1-1987") goes through the form's own check.
+    for i in np.nonzero(~fixed)[0]:
+        day[i], month[i], year[i] = parse_dob(str(dobs[i]))
+    return day, month, year
+
+def compute_charts(dobs, genders, names=None):
+    """
+    Compute driver, conductor, kuaa, name number and Lo Shu grid for many people.
+
+    The results match ``calculate_driver``, ``calculate_conductor``,
+    ``calculate_kuaa``, ``calculate_chaldean_number`` and ``generate_lo_shu_grid``
+    element for element.
+
+    Args:
+        dobs (sequence): DD-MM-YYYY strings or datetime64 values (e.g. a DataFrame column).
+        genders (sequence of str): "Male", "Female" or "NA" for each person.
+        names (sequence of str, optional): Full names for the name number.
+
+    Returns:
+        ChartBatch: One entry per input row.
+    """
+    day, month, year = parse_dobs(dobs)
+    return compute_charts_from_dates(day, month, year, genders, names)
+
+def compute_charts_from_dates(day, month, year, genders, names=None):
+    """Like ``compute_charts`` but from already split day, month and year arrays."""
+    day = np.asarray(day, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    year = np.asarray(year, dtype=np.int64)
+    genders = np.asarray(genders, dtype=str)
+    if genders.shape != day.shape:
+        raise ValueError("genders must have one entry per date of birth.")
+    male = genders == "Male"
+    female = genders == "Female"
+    if not (male | female | (genders == "NA")).all():
+        raise ValueError('gender must be one of "Male", "Female" or "NA".')
+
+    driver = _digit_sum(day)
+    # The digits of DD-MM-YYYY are those of day, month and year (padding zeros
+    # do not change a digit sum), and the conductor reduces that sum once.
+    conductor = _digit_sum(driver + _digit_sum(month) + _digit_sum(year))
+
+    year_sum = _digit_sum(year)
+    while (year_sum >= 10).any():
+        year_sum = np.where(year_sum >= 10, _digit_sum(year_sum), year_sum)
+    kuaa = np.zeros_like(year_sum)
+    kuaa[male] = 11 - year_sum[male]
+    kuaa[female] = 4 + year_sum[female]
+    while (kuaa >= 10).any():
+        kuaa = np.where(kuaa >= 10, _digit_sum(kuaa), kuaa)
+
+    grid = np.zeros((len(day), 9), dtype=np.int64)
+    _digit_counts(day, grid)
+    _digit_counts(month, grid)
+    _digit_counts(year, grid)
+    _add_single(driver, grid)
+    _add_single(conductor, grid)
+    _add_single(kuaa, grid)
+
+    name_number = chaldean_numbers(names) if names is not None else None
+    return ChartBatch(name_number, driver, conductor, kuaa, grid.astype(np.uint8))
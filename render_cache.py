@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+
+from chart_view import grid_html
+from numerology import number_interpretations
+
+# Byte budgets of the rendered-output caches
+GRID_CACHE_BYTES = int(os.environ.get("PREDICTME_GRID_CACHE_BYTES", str(4 * 1024 * 1024)))
+PDF_CACHE_BYTES = int(os.environ.get("PREDICTME_PDF_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+class ByteLRUCache:
+    """
+    A thread-safe LRU cache bounded by the total size of its values in bytes.
+
+    Values must be ``bytes`` or ``str`` (sized by their UTF-8 length). A value
+    larger than the whole budget is returned to the caller but not stored.
+    The cache can be tied to a ``version``: setting a different one empties it.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def _size(value):
+        return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def get_or_create(self, key, create):
+        """Return the cached value for ``key``, calling ``create()`` and caching its result on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def set_version(self, version):
+        """Empty the cache if ``version`` differs from the one its entries were built for."""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self.invalidations += 1
+            self._version = version
+            self._entries.clear()
+            self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+grid_cache = ByteLRUCache("grid_html", GRID_CACHE_BYTES)
+pdf_cache = ByteLRUCache("pdf", PDF_CACHE_BYTES)
+
+def cached_grid_html(grid):
+    """``chart_view.grid_html``, cached by the grid's counts (many people share a grid)."""
+    counts = tuple(grid[num] for num in range(1, 10))
+    return grid_cache.get_or_create(counts, lambda: grid_html(grid))
+
+def pdf_cache_key(chart):
+    """Everything a chart's PDF depends on besides the interpretation texts."""
+    grid = chart["grid"]
+    return (
+        chart["full_name"], chart["name_number"], chart["dob"], chart["gender"],
+        chart["driver"], chart["conductor"], chart["kuaa"], tuple(grid[num] for num in range(1, 10)),
+    )
+
+def use_interpretations(interpretations):
+    """Tie the PDF cache to these interpretation texts, emptying it if they changed."""
+    pdf_cache.set_version(tuple(sorted(interpretations.items())))
+
+def cached_pdf_bytes(chart, interpretations=None):
+    """
+    The Birth Chart PDF of ``chart`` (as returned by ``chart_for``), cached by the chart's content.
+
+    The cache is emptied whenever the interpretation texts change, since
+    every PDF embeds them.
+    """
+    from reports import generate_pdf
+
+    if interpretations is None:
+        interpretations = number_interpretations()
+    use_interpretations(interpretations)
+    return pdf_cache.get_or_create(pdf_cache_key(chart), lambda: generate_pdf(
+        chart["full_name"], chart["name_number"], chart["dob"], chart["gender"],
+        chart["driver"], chart["conductor"], chart["kuaa"], chart["grid"], interpretations,
+    ).getvalue())
+
+def cache_stats():
+    """Stats of every rendered-output cache."""
+    return [grid_cache.stats(), pdf_cache.stats()]
@@ -0,0 +1,218 @@
+import os
+import time
+from functools import lru_cache
+from io import BytesIO
+
+from numerology import number_interpretations, unpack_lo_shu
+
+# Built on first use (importing ReportLab is slow) and shared by every document
+@lru_cache(maxsize=None)
+def pdf_styles():
+    """Return the shared ``(stylesheet, chart TableStyle)``."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    table_style = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+            ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+            ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ]
+    )
+    return getSampleStyleSheet(), table_style
+
+# Function to generate and download the PDF
+def generate_pdf(full_name, chaldean_number, dob, gender, driver, conductor, kuaa, grid, interpretations):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+
+    styles, table_style = pdf_styles()
+    elements = []
+
+    # Title and Greeting
+    title = Paragraph(f"Namaste, <b>{full_name}</b>", styles["Title"])
+    elements.append(title)
+    elements.append(Spacer(1, 12))
+
+    intro = Paragraph("Here is your final Birth Chart:", styles["Normal"])
+    elements.append(intro)
+    elements.append(Spacer(1, 12))
+
+    # Birth Chart Table Data
+    data = [
+        ["Attribute", "Value"],
+        ["Full Name", full_name],
+        ["Date of Birth", dob],
+        ["Gender", gender],
+        ["Numerology Number for name", chaldean_number],
+        ["Driver Value", driver],
+        ["Conductor Value", conductor],
+        ["kuaa Value", kuaa if kuaa is not None else "Not Available"],
+    ]
+    for num, count in grid.items():
+        data.append([f"{num} - {interpretations[num]}", "Missing" if count == 0 else "Available" if count == 1 else f"Repeated {count} times"])
+
+    table = Table(data, colWidths=[300, 100])
+    table.setStyle(table_style)
+    elements.append(table)
+    elements.append(Spacer(1, 12))
+
+    # Closing Note
+    closing = Paragraph(
+        "Thank you for choosing us for this service.<br/><b>Predict Me</b>", styles["Normal"]
+    )
+    elements.append(closing)
+
+    # Build the PDF
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+def pdf_file_name(full_name):
+    """File name offered for a person's Birth Chart PDF."""
+    return f"{full_name.replace(' ', '_')}_Birth_Chart.pdf"
+
+###############################################################################
+# Bulk generation
+###############################################################################
+def iter_user_records(store=None, batch_size=1000):
+    """
+    Yield one chart record per stored user, from the chart columns saved with it.
+
+    Each record is a dict with the keyword arguments of ``generate_pdf``
+    (except ``interpretations``) plus ``phone_number``. Users without a
+    stored chart (their date of birth cannot be parsed) are skipped.
+    """
+    from storage import get_store
+
+    for rows in (store or get_store()).iter_user_chunks(batch_size):
+        for _, first_name, last_name, dob, _, _, phone_number, gender, _, name_number, driver, conductor, kuaa, lo_shu in rows:
+            if lo_shu is None:
+                continue
+            yield {
+                "full_name": f"{first_name} {last_name}",
+                "chaldean_number": name_number,
+                "dob": dob,
+                "gender": gender,
+                "driver": driver,
+                "conductor": conductor,
+                "kuaa": kuaa,
+                "grid": unpack_lo_shu(lo_shu),
+                "phone_number": phone_number,
+            }
+
+def render_pdf_chunk(chunk):
+    """Render (in a worker process) a list of ``(file_name, record)`` pairs to ``(file_name, pdf_bytes)``."""
+    interpretations = number_interpretations()
+    rendered = []
+    for file_name, record in chunk:
+        kwargs = {key: value for key, value in record.items() if key != "phone_number"}
+        rendered.append((file_name, generate_pdf(interpretations=interpretations, **kwargs).getvalue()))
+    return rendered
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for index, record in enumerate(records):
+        chunk.append((f"{index:07d}_{pdf_file_name(record['full_name']).replace('/', '_')}", record))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_pdfs_bulk(records, output, workers=None, chunk_size=32, max_pending=None, progress=None):
+    """
+    Render many Birth Chart PDFs across a process pool.
+
+    Documents are written to ``output`` as soon as their chunk completes: into
+    a zip archive when ``output`` ends with ``.zip``, otherwise into that
+    directory. At most ``max_pending`` chunks are in flight at once, so memory
+    stays bounded however many records there are.
+
+    Args:
+        records (iterable of dict): Records as yielded by ``iter_user_records``.
+        output (str): Zip file path or directory.
+        workers (int, optional): Number of worker processes (default: CPU count).
+        chunk_size (int): Documents per task sent to a worker.
+        max_pending (int, optional): Chunks in flight (default: 2 per worker).
+        progress (callable, optional): Called with the running document count.
+
+    Returns:
+        dict: ``documents``, ``seconds`` and ``docs_per_sec``.
+    """
+    import zipfile
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    to_zip = output.lower().endswith(".zip")
+    if to_zip:
+        archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    def write(rendered):
+        for file_name, pdf_bytes in rendered:
+            if to_zip:
+                archive.writestr(file_name, pdf_bytes)
+            else:
+                with open(os.path.join(output, file_name), "wb") as f:
+                    f.write(pdf_bytes)
+        return len(rendered)
+
+    documents = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for chunk in _chunks(records, chunk_size):
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        documents += write(future.result())
+                    if progress:
+                        progress(documents)
+                pending.add(pool.submit(render_pdf_chunk, chunk))
+            for future in pending:
+                documents += write(future.result())
+            if progress:
+                progress(documents)
+    finally:
+        if to_zip:
+            archive.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "documents": documents,
+        "seconds": seconds,
+        "docs_per_sec": documents / seconds if seconds else 0.0,
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage import open_store
+
+    parser = argparse.ArgumentParser(description="Regenerate Birth Chart PDFs for every stored user.")
+    parser.add_argument("output", help="Zip file (*.zip) or directory to write the PDFs to.")
+    parser.add_argument("--db", help="Users database (default: the app's); the base name of the shard files with PREDICTME_STORAGE=sharded.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Documents per worker task.")
+    args = parser.parse_args()
+
+    stats = generate_pdfs_bulk(
+        iter_user_records(open_store(db_path=args.db, pool_size=1) if args.db else None),
+        args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        progress=lambda count: print(f"\r{count} documents", end="", flush=True),
+    )
+    print(f"\n{stats['documents']} documents in {stats['seconds']:.1f}s ({stats['docs_per_sec']:.1f} docs/sec)")
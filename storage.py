@@ -0,0 +1,910 @@
+import heapq
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from chart_table import chart_for
+from numerology import LO_SHU_BITS, pack_lo_shu
+from validation import parse_dob
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("PREDICTME_DB", "user_data.db")
+
+# Storage backend (a name in ``STORAGE_BACKENDS``) and, for "sharded", the
+# number of shards. The shard count must not change once users are saved.
+STORAGE_BACKEND = os.environ.get("PREDICTME_STORAGE", "sqlite")
+NUM_SHARDS = int(os.environ.get("PREDICTME_SHARDS", "4"))
+
+# Applied to every new connection. auto_vacuum only takes effect for a new
+# database (or after a VACUUM); it lets cleanups give space back in steps.
+PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+)
+
+# Seconds a caller waits for a pooled connection when all are in use, before
+# raising TimeoutError (a leaked connection or a burst larger than the pool)
+POOL_TIMEOUT = float(os.environ.get("PREDICTME_POOL_TIMEOUT", "30"))
+
+# SQL expression for a 9-bit mask of the Lo Shu numbers whose count in the
+# packed ``lo_shu`` column matches ``condition`` (bit n-1 for number n)
+def _lo_shu_mask(condition):
+    return "(" + " | ".join(
+        f"(((({{row}}.lo_shu >> {LO_SHU_BITS * i}) & 15) {condition}) << {i})" for i in range(9)
+    ) + ")"
+
+# Counters kept current by triggers on ``users``: metric name -> SQL expression
+# giving the bucket a row is counted under ({row} is NEW or OLD). Add an entry
+# here to maintain a new insight; it is backfilled the next time the schema
+# is initialised.
+STAT_DIMENSIONS = {
+    "total": "''",
+    "gender": "{row}.gender",
+    # Activity rollups over creation_date ("YYYY-MM-DD HH:MM:SS", UTC)
+    "signup_day": "substr({row}.creation_date, 1, 10)",
+    "signup_hour": "substr({row}.creation_date, 1, 13)",
+    # Numerology rollups over the stored chart columns (NULL charts count under '')
+    "driver": "{row}.driver",
+    "conductor": "{row}.conductor",
+    "kuaa": "{row}.kuaa",
+    "name_number": "{row}.name_number",
+    "lo_shu_missing": _lo_shu_mask("= 0"),
+    "lo_shu_repeated": _lo_shu_mask("> 1"),
+}
+
+# Deleted users are logged in deleted_users (rowid and chart columns) so
+# in-memory indexes can drop them without re-reading the table; only the
+# latest entries are kept, and an index that missed some rebuilds instead.
+DELETION_LOG_SIZE = int(os.environ.get("PREDICTME_DELETION_LOG_SIZE", "100000"))
+
+USER_COLUMNS = ("first_name", "last_name", "dob", "birth_time", "place_of_birth", "phone_number", "gender")
+
+# Chart of each user, computed when it is saved; ``lo_shu`` is the packed grid
+CHART_COLUMNS = ("name_number", "driver", "conductor", "kuaa", "lo_shu")
+
+# Columns the user browser may sort on; each is indexed (rowid is the table order)
+SORT_COLUMNS = ("rowid", "gender", "dob", "phone_number")
+
+# Where a sort column differs from what is shown: dates of birth sort as ISO dates
+SORT_EXPRESSIONS = {"dob": "dob_date"}
+
+def dob_iso(dob):
+    """SQL function ``dob_iso(dob)``: a DD-MM-YYYY date of birth as YYYY-MM-DD (NULL if invalid), for ``dob_date``."""
+    try:
+        day, month, year = parse_dob(dob)
+    except (TypeError, ValueError):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def phone_prefix_clause(prefix):
+    """Return ``(sql, params)`` matching phone numbers that start with ``prefix``."""
+    # A range instead of LIKE so the unique phone index is used
+    return "phone_number >= ? AND phone_number < ?", [prefix, prefix + "\U0010ffff"]
+
+def _sort_value(sort, row):
+    """The value a ``(rowid, *USER_COLUMNS)`` row is ordered by when sorting on ``sort``."""
+    if sort == "rowid":
+        return row[0]
+    value = row[1 + USER_COLUMNS.index(sort)]
+    return dob_iso(value) if sort == "dob" else value
+
+def chart_columns(first_name, last_name, dob, gender):
+    """
+    Return the ``CHART_COLUMNS`` values of one user.
+
+    All are None when the date of birth or gender cannot be charted; kuaa is
+    None for gender "NA".
+    """
+    try:
+        chart = chart_for(f"{first_name} {last_name}", dob, gender)
+    except (TypeError, ValueError):
+        return (None,) * len(CHART_COLUMNS)
+    return chart["name_number"], chart["driver"], chart["conductor"], chart["kuaa"], pack_lo_shu(chart["grid"])
+
+def _migration_1_users(conn):
+    """Create the users table, with phone numbers unique even in databases created without that constraint."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            first_name TEXT,
+            last_name TEXT,
+            dob TEXT,
+            birth_time TEXT,
+            place_of_birth TEXT,
+            phone_number TEXT UNIQUE,
+            gender TEXT
+        )
+        """
+    )
+    if not _has_unique_phone_index(conn):
+        # Keep the first record per phone number, as save_to_sqlite always
+        # intended; later ones are moved aside to users_duplicates, not lost
+        duplicates = "SELECT rowid FROM users WHERE rowid NOT IN (SELECT MIN(rowid) FROM users GROUP BY phone_number)"
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users_duplicates (
+                original_rowid INTEGER,
+                first_name TEXT,
+                last_name TEXT,
+                dob TEXT,
+                birth_time TEXT,
+                place_of_birth TEXT,
+                phone_number TEXT,
+                gender TEXT
+            )
+            """
+        )
+        moved = conn.execute(
+            f"""
+            INSERT INTO users_duplicates
+            SELECT rowid, first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender
+            FROM users WHERE rowid IN ({duplicates})
+            """
+        ).rowcount
+        if moved:
+            logger.warning(
+                "Moved %d users sharing a phone number with an earlier user to users_duplicates; review them there.", moved
+            )
+        conn.execute(f"DELETE FROM users WHERE rowid IN ({duplicates})")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_phone_number ON users (phone_number)")
+
+def _migration_2_primary_key_and_creation_date(conn):
+    """Rebuild users with an INTEGER PRIMARY KEY (keeping rowids) and a creation_date, and index the filter columns."""
+    conn.execute(
+        """
+        CREATE TABLE users_new (
+            id INTEGER PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            dob TEXT,
+            birth_time TEXT,
+            place_of_birth TEXT,
+            phone_number TEXT UNIQUE,
+            gender TEXT,
+            creation_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # Existing users predate the column, so their creation date is unknown (NULL)
+    columns = ", ".join(USER_COLUMNS)
+    conn.execute(f"INSERT INTO users_new (id, {columns}, creation_date) SELECT rowid, {columns}, NULL FROM users")
+    conn.execute("DROP TABLE users")
+    conn.execute("ALTER TABLE users_new RENAME TO users")
+    conn.execute("CREATE INDEX idx_users_gender ON users (gender)")
+    conn.execute("CREATE INDEX idx_users_dob ON users (dob)")
+    conn.execute("CREATE INDEX idx_users_gender_dob ON users (gender, dob)")
+    conn.execute("CREATE INDEX idx_users_creation_date ON users (creation_date)")
+
+def _migration_3_chart_columns(conn, batch_size=10_000):
+    """Add the chart columns, fill them in for existing users and index them."""
+    for column in CHART_COLUMNS:
+        conn.execute(f"ALTER TABLE users ADD COLUMN {column} INTEGER")
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, first_name, last_name, dob, gender FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            f"UPDATE users SET {', '.join(f'{column} = ?' for column in CHART_COLUMNS)} WHERE rowid = ?",
+            [(*chart_columns(*row[1:]), row[0]) for row in rows],
+        )
+        last = rows[-1][0]
+    conn.execute("CREATE INDEX idx_users_driver_conductor ON users (driver, conductor)")
+    conn.execute("CREATE INDEX idx_users_name_number ON users (name_number)")
+
+def _migration_4_autoincrement_ids(conn):
+    """Rebuild users with AUTOINCREMENT ids, so the ids of deleted users are never handed out again."""
+    conn.execute(
+        """
+        CREATE TABLE users_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT,
+            last_name TEXT,
+            dob TEXT,
+            birth_time TEXT,
+            place_of_birth TEXT,
+            phone_number TEXT UNIQUE,
+            gender TEXT,
+            creation_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            name_number INTEGER,
+            driver INTEGER,
+            conductor INTEGER,
+            kuaa INTEGER,
+            lo_shu INTEGER
+        )
+        """
+    )
+    columns = ", ".join(("id",) + USER_COLUMNS + ("creation_date",) + CHART_COLUMNS)
+    conn.execute(f"INSERT INTO users_new ({columns}) SELECT {columns} FROM users")
+    conn.execute("DROP TABLE users")
+    conn.execute("ALTER TABLE users_new RENAME TO users")
+    conn.execute("CREATE INDEX idx_users_gender ON users (gender)")
+    conn.execute("CREATE INDEX idx_users_dob ON users (dob)")
+    conn.execute("CREATE INDEX idx_users_gender_dob ON users (gender, dob)")
+    conn.execute("CREATE INDEX idx_users_creation_date ON users (creation_date)")
+    conn.execute("CREATE INDEX idx_users_driver_conductor ON users (driver, conductor)")
+    conn.execute("CREATE INDEX idx_users_name_number ON users (name_number)")
+
+def _migration_5_dob_date(conn, batch_size=10_000):
+    """Add dob_date, the date of birth as YYYY-MM-DD (dob may be unpadded), and index it in place of dob."""
+    conn.execute("ALTER TABLE users ADD COLUMN dob_date TEXT")
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, dob FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany("UPDATE users SET dob_date = ? WHERE rowid = ?", [(dob_iso(dob), rowid) for rowid, dob in rows])
+        last = rows[-1][0]
+    conn.execute("DROP INDEX IF EXISTS idx_users_dob")
+    conn.execute("DROP INDEX IF EXISTS idx_users_gender_dob")
+    conn.execute("CREATE INDEX idx_users_dob_date ON users (dob_date)")
+    conn.execute("CREATE INDEX idx_users_gender_dob_date ON users (gender, dob_date)")
+
+def _migration_6_deletion_log(conn):
+    """Add deleted_users, the log of deleted users' ids and charts (filled by a trigger on users)."""
+    conn.execute(
+        """
+        CREATE TABLE deleted_users (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_rowid INTEGER NOT NULL,
+            driver INTEGER,
+            conductor INTEGER,
+            lo_shu INTEGER
+        )
+        """
+    )
+
+# Schema versions, applied in order and recorded in PRAGMA user_version.
+# Append new migrations; never edit one that has shipped.
+MIGRATIONS = (
+    _migration_1_users,
+    _migration_2_primary_key_and_creation_date,
+    _migration_3_chart_columns,
+    _migration_4_autoincrement_ids,
+    _migration_5_dob_date,
+    _migration_6_deletion_log,
+)
+
+def _has_unique_phone_index(conn):
+    for _, name, unique, *_ in conn.execute("PRAGMA index_list(users)").fetchall():
+        if unique:
+            columns = [row[2] for row in conn.execute(f'PRAGMA index_info("{name}")').fetchall()]
+            if columns == ["phone_number"]:
+                return True
+    return False
+
+def migrate(conn):
+    """
+    Bring the database schema up to date.
+
+    Each pending migration runs in its own IMMEDIATE transaction together with
+    the version bump, so concurrent processes apply it exactly once.
+
+    Returns:
+        int: The resulting schema version.
+    """
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+class ConnectionPool:
+    """
+    A fixed-size pool of long-lived SQLite connections for one process.
+
+    Connections are created on demand up to ``size``; callers beyond that
+    wait up to ``timeout`` seconds for one to be returned. A pool inherited through ``fork`` is
+    discarded and rebuilt in the child, since SQLite handles must not cross
+    processes. ``busy_timeout`` (milliseconds) overrides how long a
+    connection waits on a locked database before raising.
+    """
+
+    def __init__(self, db_path, size=8, busy_timeout=None, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if self.busy_timeout is not None:
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.create_function("dob_iso", 1, dob_iso, deterministic=True)
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"All {self.size} connections to {self.db_path} stayed in use for {self.timeout:g}s; "
+                "a connection may have leaked, or the pool is too small for the load."
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back when it is returned."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._pid == os.getpid():
+                self._idle.put(conn)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+# dob_date is derived from the dob parameter (?3) by the connection's dob_iso function
+_INSERT_USER = f"""
+    INSERT INTO users ({", ".join(USER_COLUMNS + CHART_COLUMNS)}, dob_date)
+    VALUES ({", ".join(f"?{i}" for i in range(1, len(USER_COLUMNS) + len(CHART_COLUMNS) + 1))}, dob_iso(?3))
+    ON CONFLICT (phone_number) DO NOTHING
+"""
+
+class UserStore:
+    """
+    Access to the ``users`` table through a process-wide connection pool.
+
+    Its public methods are the storage interface the app relies on;
+    ``ShardedUserStore`` implements the same one over several databases.
+    Code that needs SQL of its own runs it on each of ``shards`` (through
+    ``scatter``) and maps rowids to user ids with ``user_id``.
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size=8, busy_timeout=None):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size, busy_timeout)
+        self.init_schema()
+
+    def connection(self):
+        return self.pool.connection()
+
+    @property
+    def shards(self):
+        """The databases holding the users; a single one here."""
+        return (self,)
+
+    def user_id(self, shard, rowid):
+        """The user id of ``rowid`` in shard number ``shard``; here, the rowid itself."""
+        return rowid
+
+    def scatter(self, fn):
+        """Call ``fn(shard_index, shard)`` for every shard and return the results in shard order."""
+        return [fn(0, self)]
+
+    def close(self):
+        self.pool.close()
+
+    def init_schema(self):
+        """Apply pending migrations and (re)create the aggregate and deletion-log triggers."""
+        with self.connection() as conn:
+            migrate(conn)
+            self._init_stats(conn)
+            self._init_deletion_log(conn)
+
+    @staticmethod
+    def _init_deletion_log(conn):
+        """(Re)create the trigger logging deleted users, trimming the log to ``DELETION_LOG_SIZE`` entries."""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TRIGGER IF EXISTS users_deletion_log")
+            conn.execute(
+                f"""
+                CREATE TRIGGER users_deletion_log AFTER DELETE ON users BEGIN
+                    INSERT INTO deleted_users (user_rowid, driver, conductor, lo_shu)
+                    VALUES (OLD.rowid, OLD.driver, OLD.conductor, OLD.lo_shu);
+                    DELETE FROM deleted_users WHERE seq <= (SELECT MAX(seq) FROM deleted_users) - {DELETION_LOG_SIZE};
+                END
+                """
+            )
+
+    @staticmethod
+    def _init_stats(conn):
+        """(Re)create the ``user_stats`` triggers and backfill metrics that have no counters yet."""
+        def bump(row, delta):
+            return "".join(
+                f"""
+                INSERT INTO user_stats (metric, bucket, count)
+                VALUES ('{metric}', IFNULL({expression.format(row=row)}, ''), {delta})
+                ON CONFLICT (metric, bucket) DO UPDATE SET count = count + ({delta});"""
+                for metric, expression in STAT_DIMENSIONS.items()
+            )
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    metric TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (metric, bucket)
+                ) WITHOUT ROWID
+                """
+            )
+            for event in ("insert", "delete", "update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS users_stats_{event}")
+            conn.execute(f"CREATE TRIGGER users_stats_insert AFTER INSERT ON users BEGIN {bump('NEW', 1)} END")
+            conn.execute(f"CREATE TRIGGER users_stats_delete AFTER DELETE ON users BEGIN {bump('OLD', -1)} END")
+            conn.execute(f"CREATE TRIGGER users_stats_update AFTER UPDATE ON users BEGIN {bump('OLD', -1)} {bump('NEW', 1)} END")
+
+            tracked = {row[0] for row in conn.execute("SELECT DISTINCT metric FROM user_stats")}
+            for metric, expression in STAT_DIMENSIONS.items():
+                if metric not in tracked:
+                    bucket = f"IFNULL({expression.format(row='users')}, '')"
+                    conn.execute(
+                        f"""
+                        INSERT INTO user_stats (metric, bucket, count)
+                        SELECT ?, {bucket}, COUNT(*) FROM users GROUP BY {bucket}
+                        """,
+                        (metric,),
+                    )
+
+    def insert_user(self, first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender):
+        """
+        Insert one user, with its chart, in a single atomic statement.
+
+        Returns:
+            bool: True if the user was saved, False if the phone number already exists.
+        """
+        with self.connection() as conn:
+            with conn:
+                cursor = conn.execute(
+                    _INSERT_USER,
+                    (first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender,
+                     *chart_columns(first_name, last_name, dob, gender)),
+                )
+            return cursor.rowcount == 1
+
+    def insert_users(self, rows, charted=False, skipped=None):
+        """
+        Insert many users (with their charts) in one transaction, skipping phone numbers that already exist.
+
+        Args:
+            rows (iterable of tuple): Values in ``USER_COLUMNS`` order.
+            charted (bool): The rows already end with their ``CHART_COLUMNS``
+                values (e.g. computed in bulk), so they are not computed here.
+            skipped (list, optional): Receives the rows (with their chart
+                columns) not inserted because their phone number was already
+                stored, looked up inside the write transaction.
+
+        Returns:
+            int: Number of users actually inserted.
+        """
+        if not charted:
+            rows = ((*row, *chart_columns(row[0], row[1], row[2], row[6])) for row in rows)
+        with self.connection() as conn:
+            with conn:
+                if skipped is not None:
+                    rows = list(rows)
+                    conn.execute("BEGIN IMMEDIATE")
+                    existing = self._existing_phones(conn, [row[5] for row in rows])
+                    skipped.extend(row for row in rows if row[5] in existing)
+                    rows = [row for row in rows if row[5] not in existing]
+                    if not rows:
+                        return 0
+                cursor = conn.executemany(_INSERT_USER, rows)
+            return cursor.rowcount
+
+    def phone_exists(self, phone_number):
+        """Whether a user with this phone number is stored (a read; it never waits on writers)."""
+        with self.connection() as conn:
+            return conn.execute("SELECT 1 FROM users WHERE phone_number = ?", (phone_number,)).fetchone() is not None
+
+    def existing_phones(self, phone_numbers, batch_size=500):
+        """The subset of ``phone_numbers`` already stored, looked up on the unique index."""
+        with self.connection() as conn:
+            return self._existing_phones(conn, list(phone_numbers), batch_size)
+
+    @staticmethod
+    def _existing_phones(conn, phone_numbers, batch_size=500):
+        found = set()
+        for start in range(0, len(phone_numbers), batch_size):
+            batch = phone_numbers[start:start + batch_size]
+            found.update(
+                row[0] for row in conn.execute(
+                    f"SELECT phone_number FROM users WHERE phone_number IN ({', '.join('?' * len(batch))})", batch
+                )
+            )
+        return found
+
+    def user_stats(self, metric, since=None):
+        """
+        Return the maintained counters of one ``STAT_DIMENSIONS`` metric as ``{bucket: count}``.
+
+        This reads the small ``user_stats`` table, never ``users``. ``since``
+        keeps only buckets sorting at or after it (e.g. an hour for
+        ``signup_hour``).
+        """
+        query = "SELECT bucket, count FROM user_stats WHERE metric = ? AND count != 0"
+        params = [metric]
+        if since is not None:
+            query += " AND bucket >= ?"
+            params.append(since)
+        with self.connection() as conn:
+            rows = conn.execute(query + " ORDER BY bucket", params).fetchall()
+        return dict(rows)
+
+    def total_users(self):
+        return self.user_stats("total").get("", 0)
+
+    def lo_shu_distribution(self, metric="lo_shu_missing"):
+        """
+        Count users per Lo Shu number from a mask metric (``lo_shu_missing`` or ``lo_shu_repeated``).
+
+        Aggregated in SQL over the at most 512 mask buckets of ``user_stats``.
+
+        Returns:
+            dict: ``{number: users}`` for numbers 1-9.
+        """
+        with self.connection() as conn:
+            rows = conn.execute(
+                """
+                WITH RECURSIVE numbers (num) AS (SELECT 1 UNION ALL SELECT num + 1 FROM numbers WHERE num < 9)
+                SELECT num, IFNULL(SUM(count), 0)
+                FROM numbers LEFT JOIN user_stats
+                    ON metric = ? AND bucket != '' AND (CAST(bucket AS INTEGER) >> (num - 1)) & 1
+                GROUP BY num ORDER BY num
+                """,
+                (metric,),
+            ).fetchall()
+        return dict(rows)
+
+    def fetch_users(self, user_ids):
+        """
+        Fetch users by id.
+
+        Returns:
+            list: ``(rowid, *USER_COLUMNS)`` rows in the order of ``user_ids``
+            (ids that do not exist are skipped).
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"SELECT rowid, {', '.join(USER_COLUMNS)} FROM users WHERE rowid IN ({', '.join('?' * len(user_ids))})",
+                user_ids,
+            ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [by_id[user_id] for user_id in user_ids if user_id in by_id]
+
+    def iter_user_chunks(self, chunk_size=10_000):
+        """
+        Stream every user with its stored chart, ``chunk_size`` rows at a time.
+
+        The rows come from one cursor, so the export sees a consistent
+        snapshot and only one chunk is held in memory.
+
+        Yields:
+            list: ``(rowid, *USER_COLUMNS, creation_date, *CHART_COLUMNS)`` rows in rowid order.
+        """
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"SELECT rowid, {', '.join(USER_COLUMNS)}, creation_date, {', '.join(CHART_COLUMNS)} FROM users ORDER BY rowid"
+            )
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield rows
+            finally:
+                cursor.close()
+
+    def fetch_users_page(self, sort="rowid", descending=False, after=None, limit=50, gender=None, dob=None, phone_prefix=None):
+        """
+        Fetch one page of users with keyset pagination.
+
+        Only ``limit`` rows are ever read, however deep the page: the query
+        seeks past ``after`` on the sort column's index instead of using OFFSET.
+
+        Args:
+            sort (str): One of ``SORT_COLUMNS``.
+            descending (bool): Sort order.
+            after (tuple, optional): The cursor returned with the previous page.
+            limit (int): Page size.
+            gender (str, optional): Only users with this gender.
+            dob (str, optional): Only users born on this DD-MM-YYYY date
+                (however it was typed, e.g. ``1-10-1991`` or ``01-10-1991``).
+            phone_prefix (str, optional): Only phone numbers starting with this.
+
+        Returns:
+            tuple: ``(rows, next_cursor)``; rows are ``(rowid, *USER_COLUMNS)``
+            and ``next_cursor`` is None on the last page.
+
+        Raises:
+            ValueError: If ``sort`` is unknown or ``dob`` is not a valid date.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort users by {sort!r}.")
+        clauses, params = [], []
+        if gender:
+            clauses.append("gender = ?")
+            params.append(gender)
+        if dob:
+            if dob_iso(dob) is None:
+                raise ValueError("Invalid date format. Please enter in DD-MM-YYYY format.")
+            clauses.append("dob_date = ?")
+            params.append(dob_iso(dob))
+        if phone_prefix:
+            clause, prefix_params = phone_prefix_clause(phone_prefix)
+            clauses.append(clause)
+            params.extend(prefix_params)
+        column = SORT_EXPRESSIONS.get(sort, sort)
+        op = "<" if descending else ">"
+        # Ranges read in turn until the page is full, each a seek on the sort
+        # column's index. NULLs sort first, so past a NULL come the later
+        # NULLs and then (ascending) every value; past a value come the later
+        # values and then (descending) every NULL.
+        if after is None:
+            ranges = [(None, ())]
+        elif sort == "rowid":
+            ranges = [(f"rowid {op} ?", (after[1],))]
+        elif after[0] is None:
+            ranges = [(f"{column} IS NULL AND rowid {op} ?", (after[1],))]
+            if not descending:
+                ranges.append((f"{column} IS NOT NULL", ()))
+        else:
+            ranges = [(f"({column}, rowid) {op} (?, ?)", tuple(after))]
+            if descending:
+                ranges.append((f"{column} IS NULL", ()))
+        direction = "DESC" if descending else "ASC"
+        order = f"rowid {direction}" if sort == "rowid" else f"{column} {direction}, rowid {direction}"
+        rows = []
+        with self.connection() as conn:
+            for condition, range_params in ranges:
+                conditions = clauses + [condition] if condition else clauses
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                rows += conn.execute(
+                    f"SELECT rowid, {', '.join(USER_COLUMNS)} FROM users {where} ORDER BY {order} LIMIT ?",
+                    (*params, *range_params, limit + 1 - len(rows)),
+                ).fetchall()
+                if len(rows) > limit:
+                    break
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (_sort_value(sort, rows[-1]), rows[-1][0])
+
+def shard_paths(db_path, count):
+    """The database files of a local ``count``-shard store: ``user_data.db`` -> ``user_data.shard0.db``, ..."""
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{index}{ext}" for index in range(count)]
+
+class ShardedUserStore:
+    """
+    The ``UserStore`` interface over several databases, split by phone number.
+
+    A user lives in shard ``crc32(phone_number) % len(shards)``, so writes
+    and phone lookups touch one shard, while counts, pages and fetches are
+    scattered to every shard in parallel (SQLite releases the GIL while it
+    works) and gathered here. Each shard is a ``UserStore`` with its own
+    pool and write lock, so write capacity grows with the number of shards.
+
+    User ids are ``rowid * len(shards) + shard``: unique across shards and
+    ordered like the rowids within each one.
+    """
+
+    def __init__(self, paths, pool_size=8, busy_timeout=None):
+        self.db_paths = list(paths)
+        if not self.db_paths:
+            raise ValueError("A sharded store needs at least one shard.")
+        self._shards = tuple(UserStore(path, pool_size, busy_timeout) for path in self.db_paths)
+        self._executor = ThreadPoolExecutor(max_workers=len(self._shards), thread_name_prefix="shard")
+
+    @property
+    def shards(self):
+        return self._shards
+
+    def shard_index(self, phone_number):
+        """The shard holding ``phone_number`` (a stable hash, the same in every process)."""
+        return zlib.crc32((phone_number or "").encode("utf-8")) % len(self._shards)
+
+    def user_id(self, shard, rowid):
+        return rowid * len(self._shards) + shard
+
+    def _locate(self, user_id):
+        shard = user_id % len(self._shards)
+        return shard, (user_id - shard) // len(self._shards)
+
+    def scatter(self, fn):
+        return list(self._executor.map(fn, range(len(self._shards)), self._shards))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for shard in self._shards:
+            shard.close()
+
+    def insert_user(self, first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender):
+        shard = self._shards[self.shard_index(phone_number)]
+        return shard.insert_user(first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender)
+
+    def insert_users(self, rows, charted=False, skipped=None):
+        """
+        ``UserStore.insert_users``, one transaction per shard.
+
+        The shards commit independently (and in parallel), so a failure can
+        leave the rows of other shards saved.
+        """
+        by_shard = [[] for _ in self._shards]
+        for row in rows:
+            by_shard[self.shard_index(row[5])].append(row)
+        skipped_by_shard = [None if skipped is None else [] for _ in self._shards]
+        inserted = sum(self.scatter(
+            lambda index, shard: shard.insert_users(by_shard[index], charted, skipped_by_shard[index]) if by_shard[index] else 0
+        ))
+        if skipped is not None:
+            for rows in skipped_by_shard:
+                skipped.extend(rows)
+        return inserted
+
+    def phone_exists(self, phone_number):
+        return self._shards[self.shard_index(phone_number)].phone_exists(phone_number)
+
+    def existing_phones(self, phone_numbers, batch_size=500):
+        by_shard = [[] for _ in self._shards]
+        for phone_number in phone_numbers:
+            by_shard[self.shard_index(phone_number)].append(phone_number)
+        return set().union(*self.scatter(
+            lambda index, shard: shard.existing_phones(by_shard[index], batch_size) if by_shard[index] else set()
+        ))
+
+    def user_stats(self, metric, since=None):
+        totals = {}
+        for stats in self.scatter(lambda _, shard: shard.user_stats(metric, since)):
+            for bucket, count in stats.items():
+                totals[bucket] = totals.get(bucket, 0) + count
+        return {bucket: totals[bucket] for bucket in sorted(totals) if totals[bucket]}
+
+    def total_users(self):
+        return self.user_stats("total").get("", 0)
+
+    def lo_shu_distribution(self, metric="lo_shu_missing"):
+        totals = dict.fromkeys(range(1, 10), 0)
+        for distribution in self.scatter(lambda _, shard: shard.lo_shu_distribution(metric)):
+            for num, count in distribution.items():
+                totals[num] += count
+        return totals
+
+    def fetch_users(self, user_ids):
+        user_ids = list(user_ids)
+        by_shard = [[] for _ in self._shards]
+        for user_id in user_ids:
+            shard, rowid = self._locate(user_id)
+            by_shard[shard].append(rowid)
+        by_id = {}
+        for index, rows in enumerate(self.scatter(lambda index, shard: shard.fetch_users(by_shard[index]))):
+            by_id.update((self.user_id(index, row[0]), (self.user_id(index, row[0]), *row[1:])) for row in rows)
+        return [by_id[user_id] for user_id in user_ids if user_id in by_id]
+
+    def iter_user_chunks(self, chunk_size=10_000):
+        """``UserStore.iter_user_chunks``, one shard after the other (each in its own snapshot)."""
+        for index, shard in enumerate(self._shards):
+            chunks = shard.iter_user_chunks(chunk_size)
+            try:
+                for rows in chunks:
+                    yield [(self.user_id(index, row[0]), *row[1:]) for row in rows]
+            finally:
+                chunks.close()
+
+    def fetch_users_page(self, sort="rowid", descending=False, after=None, limit=50, gender=None, dob=None, phone_prefix=None):
+        """
+        ``UserStore.fetch_users_page`` across the shards.
+
+        Every shard returns its own next ``limit`` rows past the cursor and
+        the sorted streams are merged, so a page costs ``limit`` rows per
+        shard however deep it is. Rows are ordered by the sort column, then
+        by user id.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort users by {sort!r}.")
+        count = len(self._shards)
+
+        def shard_page(index, shard):
+            local_after = None
+            if after is not None:
+                # The shard's rows past user id after[1] are those past this rowid
+                boundary = -((index - after[1]) // count) if descending else (after[1] - index) // count
+                local_after = (after[0], boundary)
+            rows, next_cursor = shard.fetch_users_page(sort, descending, local_after, limit, gender, dob, phone_prefix)
+            return [(self.user_id(index, row[0]), *row[1:]) for row in rows], next_cursor is not None
+
+        def key(row):
+            if sort == "rowid":
+                return row[0]
+            value = _sort_value(sort, row)
+            # NULLs sort first, as in SQLite
+            return value is not None, value, row[0]
+
+        pages = self.scatter(shard_page)
+        merged = list(heapq.merge(*(rows for rows, _ in pages), key=key, reverse=descending))
+        if len(merged) <= limit and not any(more for _, more in pages):
+            return merged, None
+        rows = merged[:limit]
+        return rows, (_sort_value(sort, rows[-1]), rows[-1][0])
+
+# Storage backends by name (``PREDICTME_STORAGE``): a factory taking the
+# database path and the pool size. Add an entry here to plug in a new one.
+STORAGE_BACKENDS = {
+    "sqlite": UserStore,
+    "sharded": lambda db_path, pool_size: ShardedUserStore(shard_paths(db_path, NUM_SHARDS), pool_size),
+}
+
+def open_store(backend=None, db_path=DB_PATH, pool_size=8):
+    """
+    Open a users store with the named backend (``PREDICTME_STORAGE`` by default).
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}; use one of {', '.join(STORAGE_BACKENDS)}.")
+    return STORAGE_BACKENDS[backend](db_path, pool_size)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return this process's users store (see ``open_store``), creating the schema on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store()
+    return _store
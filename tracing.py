@@ -0,0 +1,159 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+
+# How many spans and requests are kept in memory
+MAX_SPANS = int(os.environ.get("PREDICTME_TRACE_SPANS", "5000"))
+MAX_REQUESTS = int(os.environ.get("PREDICTME_TRACE_REQUESTS", "500"))
+
+# When set, every finished span is also appended to this JSON-lines file by a
+# background thread; past this size it is moved to TRACE_FILE + ".1"
+TRACE_FILE = os.environ.get("PREDICTME_TRACE_FILE")
+TRACE_FILE_MAX_BYTES = int(float(os.environ.get("PREDICTME_TRACE_FILE_MB", "64")) * 1024 * 1024)
+
+_spans = deque(maxlen=MAX_SPANS)
+_requests = deque(maxlen=MAX_REQUESTS)
+_lock = threading.Lock()
+_ids = count(1)
+_current = contextvars.ContextVar("predictme_trace_request", default=None)
+_once = set()
+_file_queue = queue.Queue(maxsize=10 * MAX_SPANS)
+_STOP = object()
+
+def _record(span):
+    with _lock:
+        _spans.append(span)
+    if TRACE_FILE:
+        # Spans the file writer cannot keep up with are only kept in memory
+        try:
+            _file_queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+def _write_trace_file():
+    f = open(TRACE_FILE, "a")
+    try:
+        while True:
+            spans = [_file_queue.get()]
+            while len(spans) < 1000:
+                try:
+                    spans.append(_file_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = spans[-1] is _STOP
+            f.writelines(json.dumps(span) + "\n" for span in spans if span is not _STOP)
+            f.flush()
+            if stop:
+                return
+            if f.tell() >= TRACE_FILE_MAX_BYTES:
+                f.close()
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+                f = open(TRACE_FILE, "a")
+    finally:
+        f.close()
+
+def _close_trace_file():
+    try:
+        _file_queue.put(_STOP, timeout=5)
+    except queue.Full:
+        return
+    _file_writer.join(timeout=5)
+
+if TRACE_FILE:
+    _file_writer = threading.Thread(target=_write_trace_file, name="trace-file-writer", daemon=True)
+    _file_writer.start()
+    atexit.register(_close_trace_file)
+
+@contextmanager
+def request(name):
+    """
+    Trace one unit of work (a Streamlit rerun, an API call, a download).
+
+    Spans opened inside it are attributed to it, and its total duration and
+    per-stage breakdown are kept for the slowest-requests view.
+    """
+    info = {"id": next(_ids), "name": name, "started": time.time(), "stages": {}}
+    token = _current.set(info)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        _current.reset(token)
+        info["duration_ms"] = (time.perf_counter() - start) * 1000
+        _record({"request": info["id"], "stage": name, "duration_ms": info["duration_ms"], "started": info["started"]})
+        with _lock:
+            _requests.append(info)
+
+@contextmanager
+def span(stage):
+    """Time one stage; outside any ``request`` it is recorded on its own."""
+    info = _current.get()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _record({"request": info["id"] if info else None, "stage": stage, "duration_ms": duration_ms, "started": started})
+        if info is not None:
+            info["stages"][stage] = info["stages"].get(stage, 0.0) + duration_ms
+
+@contextmanager
+def span_once(stage):
+    """Like ``span``, but recorded only the first time per process, e.g. for cold-start work."""
+    with _lock:
+        first = stage not in _once
+        _once.add(stage)
+    if first:
+        with span(stage):
+            yield
+    else:
+        yield
+
+def _quantile(sorted_values, q):
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def stage_stats():
+    """Return ``[{stage, count, p50_ms, p95_ms, p99_ms, max_ms}]`` over the buffered spans."""
+    with _lock:
+        spans = list(_spans)
+    durations = {}
+    for s in spans:
+        durations.setdefault(s["stage"], []).append(s["duration_ms"])
+    stats = []
+    for stage, values in sorted(durations.items()):
+        values.sort()
+        stats.append({
+            "stage": stage,
+            "count": len(values),
+            "p50_ms": _quantile(values, 0.50),
+            "p95_ms": _quantile(values, 0.95),
+            "p99_ms": _quantile(values, 0.99),
+            "max_ms": values[-1],
+        })
+    return stats
+
+def slowest_requests(limit=10):
+    """The slowest buffered requests, slowest first."""
+    with _lock:
+        requests = list(_requests)
+    return sorted(requests, key=lambda r: r["duration_ms"], reverse=True)[:limit]
+
+def export_spans():
+    """The buffered spans as JSON lines."""
+    with _lock:
+        spans = list(_spans)
+    return "".join(json.dumps(s) + "\n" for s in spans)
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _requests.clear()
@@ -0,0 +1,62 @@
+import re
+from datetime import date
+
+# The checks every submission passes, from the form, the chart API or
+# ingest.py. DOB is DD-MM-YYYY and birth time HH:MM:SS, each field with or
+# without its leading zero (no spaces or signs).
+
+# Regex for +91-9876543210 format
+PHONE_PATTERN = re.compile(r"^\+\d+-\d{10}$")
+DOB_PATTERN = re.compile(r"^(3[01]|[12]\d|0[1-9]|[1-9])-(1[0-2]|0[1-9]|[1-9])-(\d{4})\Z")
+BIRTH_TIME_PATTERN = re.compile(r"^(2[0-3]|[01]\d|\d):([0-5]\d|\d):([0-5]\d|\d)\Z")
+
+# Genders a chart can be computed for (the chart table's gender axis follows
+# this order), and those a saved user may have; "NA" gets a chart but is not saved
+GENDERS = ("Male", "Female", "NA")
+SAVED_GENDERS = ("Male", "Female")
+
+def parse_dob(dob):
+    """
+    Return ``(day, month, year)`` of a DD-MM-YYYY date of birth.
+
+    Raises:
+        ValueError: If it is not a valid date in that format.
+    """
+    match = DOB_PATTERN.match(dob)
+    if match is None:
+        raise ValueError("Invalid date format. Please enter in DD-MM-YYYY format.")
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        date(year, month, day)
+    except ValueError:
+        raise ValueError("Invalid date format. Please enter in DD-MM-YYYY format.") from None
+    return day, month, year
+
+def valid_birth_time(birth_time):
+    return BIRTH_TIME_PATTERN.match(birth_time) is not None
+
+def valid_phone(phone_number):
+    return PHONE_PATTERN.match(phone_number) is not None
+
+def validate_user(first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender):
+    """
+    Apply the checks a submission must pass before ``save_to_sqlite``.
+
+    Returns:
+        tuple: ``((day, month, year), None)`` for a valid user, or ``(None, reason)``.
+    """
+    if not (first_name and last_name and dob and birth_time and phone_number):
+        return None, "Missing required field: first_name, last_name, dob, birth_time and phone_number are required."
+    try:
+        parts = parse_dob(dob)
+    except ValueError as e:
+        return None, str(e)
+    if not valid_birth_time(birth_time):
+        return None, "Invalid Birth Time. Please enter in HH:MM:SS format."
+    if not valid_phone(phone_number):
+        return None, "Invalid Phone Number. Please enter in this +91-9876543210 format."
+    if not place_of_birth:
+        return None, "Missing place of birth."
+    if gender not in SAVED_GENDERS:
+        return None, "Gender not specified. Please provide Male or Female."
+    return parts, None
@@ -0,0 +1,172 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from storage import get_store
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get("PREDICTME_WRITE_BATCH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.environ.get("PREDICTME_WRITE_FLUSH_INTERVAL", "0.05"))
+MAX_QUEUE = int(os.environ.get("PREDICTME_WRITE_MAX_QUEUE", "10000"))
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Save user submissions from a background thread in batched transactions.
+
+    ``submit`` answers the duplicate-phone question immediately (from the
+    records still queued and an indexed read of the database) and leaves the
+    commit to the writer thread, so callers never wait on disk syncs. When the
+    queue is full, ``submit`` blocks for up to ``put_timeout`` seconds and then
+    saves the record synchronously rather than dropping it.
+    """
+
+    def __init__(self, store=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE, put_timeout=2.0):
+        self.store = store or get_store()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()  # phone numbers queued but not yet committed
+        self._batches_done = 0  # batches whose numbers have left _pending
+        self._lock = threading.Lock()
+        self._closed = False
+        # Commits retried after a lock error, seconds lost to those failed
+        # attempts and their backoff, and records that could not be saved
+        # (updated by the writer thread only)
+        self.retries = 0
+        self.lock_wait = 0.0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="user-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender):
+        """
+        Queue one user for saving.
+
+        Returns:
+            bool: True if the user will be saved, False if the phone number already exists.
+        """
+        row = (first_name, last_name, dob, birth_time, place_of_birth, phone_number, gender)
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("The write-behind queue is closed.")
+                if phone_number in self._pending:
+                    return False
+                batches_done = self._batches_done
+            # The database read runs outside the lock, so submissions do not queue behind it
+            if self.store.phone_exists(phone_number):
+                return False
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("The write-behind queue is closed.")
+                if phone_number in self._pending:
+                    return False
+                # A batch committed during the read may hold this number: read again
+                if self._batches_done == batches_done:
+                    self._pending.add(phone_number)
+                    break
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: the writer is behind, so this caller pays for its own commit
+            try:
+                return self.store.insert_user(*row)
+            finally:
+                with self._lock:
+                    self._pending.discard(phone_number)
+        return True
+
+    def flush(self):
+        """Block until every queued record has been committed."""
+        self._queue.join()
+
+    def close(self, timeout=30.0):
+        """Stop accepting records, commit everything queued and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = any(row is _STOP for row in batch)
+            if stopping:
+                # Pick up submissions that raced with close()
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            rows = [row for row in batch if row is not _STOP]
+            try:
+                if rows:
+                    self._write(rows)
+            except Exception:
+                # Never let one batch stop the writer thread
+                logger.exception("Unexpected error saving %d user records", len(rows))
+            finally:
+                with self._lock:
+                    self._pending.difference_update(row[5] for row in rows)
+                    self._batches_done += 1
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                return
+
+    def _write(self, rows, attempts=5):
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                self.store.insert_users(rows)
+                return
+            except sqlite3.OperationalError:
+                if attempt < attempts - 1:
+                    self.retries += 1
+                    time.sleep(0.1 * 2 ** attempt)
+                    self.lock_wait += time.perf_counter() - started
+                    continue
+                logger.exception("Committing %d user records failed %d times", len(rows), attempts)
+            except Exception:
+                logger.exception("Committing %d user records failed", len(rows))
+            break
+        # Save what can be saved one record at a time, so one bad record does not lose the batch
+        for row in rows:
+            try:
+                self.store.insert_user(*row)
+            except Exception:
+                logger.exception("Dropping the user record for phone number %s", row[5])
+                self.dropped += 1
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Return this process's write-behind queue, started on first use and drained at exit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindQueue()
+                atexit.register(_writer.close)
+    return _writer